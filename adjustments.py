@@ -144,15 +144,17 @@ def soft_delete_payment(payment_id):
 
 def restore_payment(payment_id):
     conn = get_db_connection()
-    conn.execute(
-        'UPDATE payments SET is_deleted = 0, deleted_at = NULL WHERE id = ?',
+    cursor = conn.execute(
+        'UPDATE OR IGNORE payments SET is_deleted = 0, deleted_at = NULL WHERE id = ?',
         (payment_id,)
     )
+    restored = cursor.rowcount > 0
     conn.commit()
     conn.close()
 
-    log_action(
-        'payment_restored',
-        f'Payment restored from trash: {payment_id}'
-    )
-    return True
+    if restored:
+        log_action(
+            'payment_restored',
+            f'Payment restored from trash: {payment_id}'
+        )
+    return restored
@@ -199,8 +199,7 @@ async function saveOperator() {
         body: JSON.stringify(payload)
     });
     closeModal('operatorModal');
-    loadOperators();
-    loadDashboard();
+    refreshAfterChange(loadOperators, loadDashboard);
 }
 
 async function editOperator(operatorId) {
@@ -356,7 +355,8 @@ function buildCalculationPayload() {
         motivation_override_id: document.getElementById('calcMotivationOverride').value || null,
         bonus_percent_salary: parseFloat(document.getElementById('bonusPercentSalary').value) || 0,
         bonus_percent_sales: parseFloat(document.getElementById('bonusPercentSales').value) || 0,
-        include_redemption_percent: document.getElementById('includeRedemption').checked
+        include_redemption_percent: document.getElementById('includeRedemption').checked,
+        render: true
     };
 }
 
@@ -426,9 +426,7 @@ async function saveSalaryCalculation(event) {
     if (isEditing) {
         setCalculationEditingState(null);
     }
-    loadCalculations();
-    loadPayments();
-    loadCorrections();
+    refreshAfterChange(loadCalculations, loadPayments, loadCorrections);
 }
 
 async function loadOperators() {
@@ -472,12 +470,31 @@ async function loadOperators() {
 async function trashOperator(operatorId) {
     if (!confirmDeletion('Удалить оператора?')) return;
     await fetch(`/api/trash/operator/${operatorId}`, { method: 'POST' });
-    loadOperators();
+    refreshAfterChange(loadOperators);
+}
+
+async function fetchPage(url, cursor) {
+    const separator = url.includes('?') ? '&' : '?';
+    const response = await fetch(cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url);
+    return {
+        items: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+        total: Number(response.headers.get('X-Total-Count')) || 0
+    };
+}
+
+function toggleMoreButton(buttonId, cursor) {
+    const button = document.getElementById(buttonId);
+    if (button) button.style.display = cursor ? '' : 'none';
 }
 
-async function loadCalculations() {
-    const response = await fetch('/api/calculations');
-    const calculations = await response.json();
+let calculationsCursor = null;
+
+async function loadCalculations(append = false) {
+    const page = await fetchPage('/api/calculations', append ? calculationsCursor : null);
+    const calculations = page.items;
+    calculationsCursor = page.nextCursor;
+    toggleMoreButton('calculationsMore', calculationsCursor);
     const table = document.getElementById('calculationsTable');
     const formatDate = (val) => {
         if (!val) return '—';
@@ -485,11 +502,11 @@ async function loadCalculations() {
         return isNaN(parsed) ? val : parsed.toLocaleDateString('ru-RU');
     };
     if (table) {
-        table.innerHTML = calculations.map(calc => {
+        const rows = calculations.map(calc => {
             const calcDate = formatDate(calc.calculation_date);
             const periodStart = formatDate(calc.period_start);
             const periodEnd = formatDate(calc.period_end);
-            return `<tr>
+            return `<tr data-calculation-id="${calc.id}">
                 <td>${calc.operator_name || ''}</td>
                 <td>${periodStart}${periodEnd !== '—' ? ' - ' + periodEnd : ''}</td>
                 <td>${(calc.sales_amount || 0).toLocaleString('ru-RU')} руб.</td>
@@ -504,34 +521,43 @@ async function loadCalculations() {
                 </td>
             </tr>`;
         }).join('');
+        table.innerHTML = append ? table.innerHTML + rows : rows;
     }
 }
 
-async function loadPayments() {
-    const response = await fetch('/api/payments');
-    const payments = await response.json();
+function renderPaymentRow(payment) {
+    const paymentDate = payment.calculation_date ? new Date(payment.calculation_date).toLocaleDateString('ru-RU') : '—';
+    const paidDate = payment.payment_date ? new Date(payment.payment_date).toLocaleDateString('ru-RU') : '—';
+    const correctionDate = payment.correction_date ? new Date(payment.correction_date).toLocaleDateString('ru-RU') : '—';
+    return `<tr data-payment-id="${payment.id}">
+        <td><input type="checkbox" class="payment-select" value="${payment.id}"></td>
+        <td>${payment.operator_name || '—'}</td>
+        <td>${payment.period_start || '—'}</td>
+        <td>${payment.sales_amount ? payment.sales_amount.toLocaleString('ru-RU') + ' руб.' : '—'}</td>
+        <td>${payment.kc_percent ? payment.kc_percent.toFixed(1) + '%' : '—'}</td>
+        <td>${payment.total_salary ? payment.total_salary.toLocaleString('ru-RU') + ' руб.' : '0 руб.'}</td>
+        <td><div class="form-check form-switch"><input class="form-check-input" type="checkbox" ${payment.is_paid ? 'checked' : ''} onchange="updatePaymentStatus(${payment.id}, this.checked)"> <small>${payment.is_paid ? 'Выплачено' : 'Ожидает'}</small></div></td>
+        <td>${paidDate}</td>
+        <td>${correctionDate}</td>
+        <td>
+            <button class="btn btn-sm btn-info" onclick="viewPaymentDetails(${payment.id})">👁️</button>
+            <button class="btn btn-sm btn-warning" onclick="editPayment(${payment.id})">✏️</button>
+            <button class="btn btn-sm btn-danger" onclick="deletePayment(${payment.id})">🗑️</button>
+        </td>
+    </tr>`;
+}
+
+let paymentsCursor = null;
+
+async function loadPayments(append = false) {
+    const page = await fetchPage('/api/payments', append ? paymentsCursor : null);
+    const payments = page.items;
+    paymentsCursor = page.nextCursor;
+    toggleMoreButton('paymentsMore', paymentsCursor);
     const table = document.getElementById('paymentsTable');
     if (table) {
-        table.innerHTML = payments.map(payment => {
-            const paymentDate = payment.calculation_date ? new Date(payment.calculation_date).toLocaleDateString('ru-RU') : '—';
-            const paidDate = payment.payment_date ? new Date(payment.payment_date).toLocaleDateString('ru-RU') : '—';
-            const correctionDate = payment.correction_date ? new Date(payment.correction_date).toLocaleDateString('ru-RU') : '—';
-            return `<tr>
-                <td>${payment.operator_name || '—'}</td>
-                <td>${payment.period_start || '—'}</td>
-                <td>${payment.sales_amount ? payment.sales_amount.toLocaleString('ru-RU') + ' руб.' : '—'}</td>
-                <td>${payment.kc_percent ? payment.kc_percent.toFixed(1) + '%' : '—'}</td>
-                <td>${payment.total_salary ? payment.total_salary.toLocaleString('ru-RU') + ' руб.' : '0 руб.'}</td>
-                <td><div class="form-check form-switch"><input class="form-check-input" type="checkbox" ${payment.is_paid ? 'checked' : ''} onchange="updatePaymentStatus(${payment.id}, this.checked)"> <small>${payment.is_paid ? 'Выплачено' : 'Ожидает'}</small></div></td>
-                <td>${paidDate}</td>
-                <td>${correctionDate}</td>
-                <td>
-                    <button class="btn btn-sm btn-info" onclick="viewPaymentDetails(${payment.id})">👁️</button>
-                    <button class="btn btn-sm btn-warning" onclick="editPayment(${payment.id})">✏️</button>
-                    <button class="btn btn-sm btn-danger" onclick="deletePayment(${payment.id})">🗑️</button>
-                </td>
-            </tr>`;
-        }).join('');
+        const rows = payments.map(renderPaymentRow).join('');
+        table.innerHTML = append ? table.innerHTML + rows : rows;
     }
 }
 
@@ -541,39 +567,53 @@ async function updatePaymentStatus(paymentId, isPaid) {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ is_paid: isPaid })
     });
-    loadPayments();
+    refreshAfterChange(loadPayments);
+}
+
+function toggleAllPayments(checked) {
+    document.querySelectorAll('.payment-select').forEach(box => { box.checked = checked; });
+}
+
+async function bulkPaymentAction(action) {
+    const ids = Array.from(document.querySelectorAll('.payment-select:checked')).map(box => Number(box.value));
+    if (!ids.length) return;
+    if (action === 'delete' && !confirmDeletion(`Удалить выбранные выплаты (${ids.length})?`)) return;
+    await fetch('/api/payments/bulk', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ action, ids })
+    });
+    const selectAll = document.getElementById('paymentsSelectAll');
+    if (selectAll) selectAll.checked = false;
+    refreshAfterChange(loadPayments);
 }
 
 async function loadDashboard() {
-    const [calcRes, payRes, opRes] = await Promise.all([
-        fetch('/api/calculations?limit=5'),
-        fetch('/api/payments'),
-        fetch('/api/operators')
-    ]);
-    const calculations = await calcRes.json();
-    const payments = await payRes.json();
-    const operators = await opRes.json();
+    // One request; the browser revalidates it with If-None-Match and gets a 304 when nothing changed.
+    const response = await fetch('/api/dashboard/summary', { cache: 'no-cache' });
+    const summary = await response.json();
+    const operators = summary.operators.items;
     const dashboardStats = document.getElementById('dashboardStats');
     if (dashboardStats) {
         dashboardStats.innerHTML = `
             <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 15px; text-align: center;">
                 <div style="padding: 15px; background: #f8f9fa; border-radius: 8px;">
-                    <div style="font-size: 24px; font-weight: bold; color: #3498db;">${operators.length}</div>
+                    <div style="font-size: 24px; font-weight: bold; color: #3498db;">${summary.operators.active}</div>
                     <div style="font-size: 14px; color: #666;">Операторов</div>
                 </div>
                 <div style="padding: 15px; background: #f8f9fa; border-radius: 8px;">
-                    <div style="font-size: 24px; font-weight: bold; color: #2ecc71;">${calculations.length}</div>
+                    <div style="font-size: 24px; font-weight: bold; color: #2ecc71;">${summary.calculations.count}</div>
                     <div style="font-size: 14px; color: #666;">Расчетов</div>
                 </div>
                 <div style="padding: 15px; background: #f8f9fa; border-radius: 8px;">
-                    <div style="font-size: 24px; font-weight: bold; color: #e74c3c;">${payments.length}</div>
+                    <div style="font-size: 24px; font-weight: bold; color: #e74c3c;">${summary.payments.count}</div>
                     <div style="font-size: 14px; color: #666;">Выплат</div>
                 </div>
             </div>`;
     }
     const activeOperators = document.getElementById('activeOperators');
     if (activeOperators) {
-        const activeOps = operators.filter(op => op.is_active !== 0);
+        const activeOps = operators;
         activeOperators.innerHTML = activeOps.length > 0 ? activeOps.map(op => `
             <div style="padding: 8px; margin: 5px 0; background: white; border-radius: 5px; border-left: 4px solid #3498db;">
                 <strong>${op.name}</strong><br>
@@ -582,7 +622,7 @@ async function loadDashboard() {
     }
     const recentPayments = document.getElementById('recentPayments');
     if (recentPayments) {
-        const latest = payments.slice(0, 3);
+        const latest = summary.recent_payments;
         recentPayments.innerHTML = latest.length > 0 ? latest.map(payment => `
             <div style="padding: 8px; margin: 5px 0; background: white; border-radius: 5px; border-left: 4px solid #2ecc71;">
                 <strong>${payment.operator_name}</strong><br>
@@ -636,7 +676,8 @@ async function refreshDashboardChart() {
         if (document.getElementById('dashboardStart')) document.getElementById('dashboardStart').value = startDate;
         if (document.getElementById('dashboardEnd')) document.getElementById('dashboardEnd').value = endDate;
     }
-    const params = new URLSearchParams({ metric });
+    const bucket = document.getElementById('dashboardBucket')?.value || 'day';
+    const params = new URLSearchParams({ metric, bucket });
     if (operatorId) params.append('operator_id', operatorId);
     if (start) params.append('start_date', start);
     if (end) params.append('end_date', end);
@@ -893,20 +934,19 @@ async function saveMotivation() {
         body: JSON.stringify(payload)
     });
     closeModal('motivationModal');
-    loadMotivations();
+    refreshAfterChange(loadMotivations);
 }
 
 async function trashMotivation(motivationId) {
     if (!confirmDeletion('Удалить мотивацию?')) return;
     await fetch(`/api/trash/motivation/${motivationId}`, { method: 'POST' });
-    loadMotivations();
+    refreshAfterChange(loadMotivations);
 }
 
 async function trashCalculation(calculationId) {
     if (!confirmDeletion('Удалить расчет?')) return;
     await fetch(`/api/trash/calculation/${calculationId}`, { method: 'POST' });
-    loadCalculations();
-    loadTrash();
+    refreshAfterChange(loadCalculations, loadTrash);
 }
 
 async function loadTrash() {
@@ -929,18 +969,26 @@ async function loadTrash() {
     document.getElementById('trashMotivations').innerHTML = renderList(data.motivations, 'restoreMotivation', 'deleteMotivationForever', i => i.name);
 }
 
-async function restoreOperator(id) { await fetch(`/api/trash/operator/${id}/restore`, { method: 'POST' }); loadTrash(); loadOperators(); }
-async function restorePayment(id) { await fetch(`/api/trash/payment/${id}/restore`, { method: 'POST' }); loadTrash(); loadPayments(); }
-async function restoreCalculation(id) { await fetch(`/api/trash/calculation/${id}/restore`, { method: 'POST' }); loadTrash(); loadCalculations(); }
-async function restoreMotivation(id) { await fetch(`/api/trash/motivation/${id}/restore`, { method: 'POST' }); loadTrash(); loadMotivations(); }
-async function deleteOperatorForever(id) { if (!confirmDeletion('Удалить оператора навсегда?')) return; await fetch(`/api/trash/operator/${id}/delete`, { method: 'DELETE' }); loadTrash(); }
-async function deletePaymentForever(id) { if (!confirmDeletion('Удалить выплату навсегда?')) return; await fetch(`/api/trash/payment/${id}/delete`, { method: 'DELETE' }); loadTrash(); }
-async function deleteCalculationForever(id) { if (!confirmDeletion('Удалить расчет навсегда?')) return; await fetch(`/api/trash/calculation/${id}/delete`, { method: 'DELETE' }); loadTrash(); }
-async function deleteMotivationForever(id) { if (!confirmDeletion('Удалить мотивацию навсегда?')) return; await fetch(`/api/trash/motivation/${id}/delete`, { method: 'DELETE' }); loadTrash(); }
-
-async function loadCorrections() {
-    const response = await fetch('/api/corrections');
-    const corrections = await response.json();
+async function restoreOperator(id) { await fetch(`/api/trash/operator/${id}/restore`, { method: 'POST' }); refreshAfterChange(loadTrash, loadOperators); }
+async function restorePayment(id) {
+    const response = await fetch(`/api/trash/payment/${id}/restore`, { method: 'POST' });
+    if (!response.ok) alert('Нельзя восстановить: для этого расчета уже есть действующая выплата');
+    refreshAfterChange(loadTrash, loadPayments);
+}
+async function restoreCalculation(id) { await fetch(`/api/trash/calculation/${id}/restore`, { method: 'POST' }); refreshAfterChange(loadTrash, loadCalculations); }
+async function restoreMotivation(id) { await fetch(`/api/trash/motivation/${id}/restore`, { method: 'POST' }); refreshAfterChange(loadTrash, loadMotivations); }
+async function deleteOperatorForever(id) { if (!confirmDeletion('Удалить оператора навсегда?')) return; await fetch(`/api/trash/operator/${id}/delete`, { method: 'DELETE' }); refreshAfterChange(loadTrash); }
+async function deletePaymentForever(id) { if (!confirmDeletion('Удалить выплату навсегда?')) return; await fetch(`/api/trash/payment/${id}/delete`, { method: 'DELETE' }); refreshAfterChange(loadTrash); }
+async function deleteCalculationForever(id) { if (!confirmDeletion('Удалить расчет навсегда?')) return; await fetch(`/api/trash/calculation/${id}/delete`, { method: 'DELETE' }); refreshAfterChange(loadTrash); }
+async function deleteMotivationForever(id) { if (!confirmDeletion('Удалить мотивацию навсегда?')) return; await fetch(`/api/trash/motivation/${id}/delete`, { method: 'DELETE' }); refreshAfterChange(loadTrash); }
+
+let correctionsCursor = null;
+
+async function loadCorrections(append = false) {
+    const page = await fetchPage('/api/corrections', append ? correctionsCursor : null);
+    const corrections = page.items;
+    correctionsCursor = page.nextCursor;
+    toggleMoreButton('correctionsMore', correctionsCursor);
     const table = document.getElementById('correctionsTable');
     const formatDate = (val) => {
         if (!val) return '—';
@@ -948,7 +996,7 @@ async function loadCorrections() {
         return isNaN(parsed) ? val : parsed.toLocaleDateString('ru-RU');
     };
     if (table) {
-        table.innerHTML = corrections.map(item => {
+        const rows = corrections.map(item => {
             const payment = item.payment || {};
             const period = `${formatDate(item.period_start)}${item.period_end ? ' - ' + formatDate(item.period_end) : ''}`;
             const correctionDate = item.correction_date || payment.correction_date;
@@ -964,15 +1012,14 @@ async function loadCorrections() {
                 </td>
             </tr>`;
         }).join('');
+        table.innerHTML = append ? table.innerHTML + rows : rows;
     }
 }
 
 async function deleteCorrection(correctionId) {
     if (!confirmDeletion('Удалить корректировку?')) return;
     await fetch(`/api/corrections/${correctionId}`, { method: 'DELETE' });
-    loadCorrections();
-    loadCalculations();
-    loadPayments();
+    refreshAfterChange(loadCorrections, loadCalculations, loadPayments);
 }
 
 async function openCorrection(calcId) {
@@ -1020,9 +1067,7 @@ async function saveCorrection() {
     if (result && result.total_salary !== undefined) {
         document.getElementById('correctionTotal').value = result.total_salary;
     }
-    loadCalculations();
-    loadPayments();
-    loadCorrections();
+    refreshAfterChange(loadCalculations, loadPayments, loadCorrections);
     closeModal('correctionModal');
 }
 
@@ -1112,19 +1157,115 @@ async function savePaymentEdit() {
         body: JSON.stringify(payload)
     });
     closeModal('paymentModal');
-    loadPayments();
+    refreshAfterChange(loadPayments);
 }
 
 async function deletePayment(paymentId) {
     if (!confirmDeletion('Удалить выплату?')) return;
     await fetch(`/api/payments/${paymentId}`, { method: 'DELETE' });
-    loadPayments();
+    refreshAfterChange(loadPayments);
 }
 
 async function updatePaymentStatusById(paymentId, isPaid) {
     await updatePaymentStatus(paymentId, isPaid);
 }
 
+// Live updates: /api/events pushes one compact event per changed row, so open
+// views are patched or reloaded here instead of after every action.
+
+let eventsConnected = false;
+const pendingReloads = new Map();
+const pendingPaymentPatches = new Set();
+const PAYMENT_PATCH_LIMIT = 20;
+
+function scheduleReload(loader) {
+    // Coalesces bursts (bulk actions emit one event per row) into one reload.
+    clearTimeout(pendingReloads.get(loader));
+    pendingReloads.set(loader, setTimeout(() => {
+        pendingReloads.delete(loader);
+        loader();
+    }, 300));
+}
+
+function refreshAfterChange(...loaders) {
+    // With the event stream open, the change comes back as an event and is applied there.
+    if (!eventsConnected) loaders.forEach(loader => loader());
+}
+
+function removeTableRow(attribute, id) {
+    const row = document.querySelector(`tr[${attribute}="${id}"]`);
+    if (row) row.remove();
+}
+
+async function patchPaymentRows() {
+    const ids = Array.from(pendingPaymentPatches);
+    pendingPaymentPatches.clear();
+    if (ids.length > PAYMENT_PATCH_LIMIT) {
+        loadPayments();
+        return;
+    }
+    for (const id of ids) {
+        const row = document.querySelector(`tr[data-payment-id="${id}"]`);
+        if (!row) continue;
+        const response = await fetch(`/api/payments/${id}`);
+        const payment = await response.json();
+        if (!payment.id || payment.is_deleted) {
+            row.remove();
+            continue;
+        }
+        const operator = cachedOperators.find(op => op.id === payment.operator_id);
+        payment.operator_name = operator ? operator.name : row.cells[1].textContent;
+        row.outerHTML = renderPaymentRow(payment);
+    }
+}
+
+function applyChangeEvent(change) {
+    const removed = change.operation === 'delete' || change.operation === 'purge';
+    if (change.entity === 'payment') {
+        if (removed) {
+            removeTableRow('data-payment-id', change.id);
+        } else if (change.operation === 'update') {
+            pendingPaymentPatches.add(change.id);
+            scheduleReload(patchPaymentRows);
+        } else {
+            scheduleReload(loadPayments);
+        }
+    } else if (change.entity === 'calculation') {
+        if (removed) removeTableRow('data-calculation-id', change.id);
+        else scheduleReload(loadCalculations);
+        scheduleReload(loadCorrections);
+    } else if (change.entity === 'operator') {
+        scheduleReload(loadOperators);
+    } else if (change.entity === 'motivation') {
+        scheduleReload(loadMotivations);
+    }
+    if (change.operation !== 'insert' && change.operation !== 'update') scheduleReload(loadTrash);
+    scheduleReload(loadDashboard);
+}
+
+const EVENTS_RETRY_MS = 30000;
+
+function connectEvents() {
+    if (!window.EventSource) return;
+    // The server closes each stream after a while; EventSource reconnects by itself
+    // and resumes from the last event id it saw. A refused stream (503 when the
+    // server's stream slots are taken) closes the EventSource for good, so retry
+    // later; until then our own changes reload their lists directly.
+    const source = new EventSource('/api/events');
+    source.onopen = () => { eventsConnected = true; };
+    source.onerror = () => {
+        eventsConnected = false;
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(connectEvents, EVENTS_RETRY_MS * (1 + Math.random()));
+        }
+    };
+    source.addEventListener('change', event => applyChangeEvent(JSON.parse(event.data)));
+    source.addEventListener('reset', () => {
+        [loadOperators, loadMotivations, loadCalculations, loadPayments, loadCorrections, loadTrash, loadDashboard]
+            .forEach(scheduleReload);
+    });
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     showSection('dashboard');
     loadMotivations();
@@ -1132,6 +1273,7 @@ document.addEventListener('DOMContentLoaded', () => {
     loadCalculations();
     loadPayments();
     loadDashboard();
+    connectEvents();
     enableModalInteractions('operatorModal');
     enableModalInteractions('motivationModal');
     enableModalInteractions('paymentModal');
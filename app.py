@@ -1,8 +1,17 @@
 ﻿# -*- coding: utf-8 -*-
-from flask import Flask, request, jsonify, send_from_directory
-from datetime import datetime
-
-from calculations import calculate_salary, get_calculations_with_filters, update_calculation
+import hmac
+import os
+import sqlite3
+import time
+from functools import wraps
+
+from flask import Flask, request, jsonify, make_response
+from datetime import datetime, timezone
+
+from calculations import (
+    calculate_salary, calculate_salary_batch, get_calculations_with_filters,
+    update_calculation, render_breakdown, breakdown_steps
+)
 from operators import (
     get_all_operators, get_operator, add_operator, update_operator,
     soft_delete_operator, restore_operator, get_deleted_operators,
@@ -10,6 +19,7 @@ from operators import (
 )
 from payments import (
     create_payment, get_payments, get_payment_by_id, update_payment_status, update_payment,
+    bulk_update_payments, get_payment_statistics,
     soft_delete_payment, restore_payment, get_deleted_payments,
     delete_payment_forever
 )
@@ -22,39 +32,105 @@ from motivations import (
     get_motivations, get_motivation,
     add_motivation, update_motivation,
     soft_delete_motivation, restore_motivation,
-    get_deleted_motivations, delete_motivation_forever
+    get_deleted_motivations, delete_motivation_forever,
+    resolve_motivation_snapshots
 )
-from config import get_db_connection
+from backtest import backtest_motivation
+from config import get_db_connection, release_db_connection
+from data_versions import current_version
+from day_keys import UNKNOWN_DAY, day_filter, from_day, to_day
+from pagination import keyset_page, live_row_count, next_cursor, page_size
+import events
+import metrics
+import responses
+import slow_queries
+import static_assets
+
+app = Flask(__name__, static_folder=None)
+app.teardown_appcontext(release_db_connection)
+responses.init_app(app)
+metrics.init_app(app)
 
-app = Flask(__name__)
+# =========================
+# CONDITIONAL GET
+# =========================
+
+def _not_modified(etag, updated_at):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and updated_at is not None and int(updated_at) <= since.timestamp()
+
+
+def versioned(*tables):
+    """Send ETag/Last-Modified from data_versions and answer revalidations with a 304.
+
+    The version is read before the view runs, so a body is never older than the
+    validator sent with it. A matching If-None-Match (or, without one,
+    If-Modified-Since) returns before the view touches any table. Last-Modified
+    is only sent, and If-Modified-Since only honoured, once the second of the
+    last change has passed. No tables means the global version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            checked_at = time.time()
+            conn = get_db_connection()
+            version, updated_at = current_version(conn, tables or None)
+            conn.close()
+            # Last-Modified has one-second resolution: while the last change's
+            # second is still running, a later write in that second would carry
+            # the same date. Only the exact ETag is used until the second is over.
+            if updated_at is not None and int(updated_at) >= int(checked_at):
+                updated_at = None
+            etag = f'{view.__name__}-{version}'
+            if _not_modified(etag, updated_at):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # Weak, so the validator still matches once the body is gzip/brotli encoded.
+            response.set_etag(etag, weak=True)
+            if updated_at is not None:
+                response.last_modified = datetime.fromtimestamp(int(updated_at), timezone.utc)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
 
 # =========================
 # STATIC
 # =========================
 
+# Only the built front-end is served; nothing else in the project directory
+# (operators.db, backups, scripts) is reachable by URL.
+
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_assets.index_response()
 
-@app.route('/<path:path>')
-def serve_static(path):
-    return send_from_directory('.', path)
+@app.route('/static/<name>')
+def serve_static(name):
+    return static_assets.asset_response(name)
 
 # =========================
 # OPERATORS
 # =========================
 
 @app.route('/api/operators', methods=['GET'])
+@versioned('operators')
 def api_get_operators():
     conn = get_db_connection()
     rows = conn.execute(
         'SELECT * FROM operators WHERE is_deleted = 0 AND is_active = 1 ORDER BY name'
     ).fetchall()
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    return jsonify(rows)
 
 
 @app.route('/api/operators/<int:operator_id>', methods=['GET'])
+@versioned('operators')
 def api_get_operator(operator_id):
     op = get_operator(operator_id)
     return jsonify(dict(op) if op else {})
@@ -91,6 +167,17 @@ def api_update_operator(operator_id):
 # CALCULATIONS
 # =========================
 
+def _wants_render(data=None):
+    value = (data or {}).get('render', request.args.get('render', 'false'))
+    return value is True or str(value).lower() in ('1', 'true', 'yes')
+
+
+def _with_rendered_steps(result, data=None):
+    if result and _wants_render(data):
+        result['detailed_breakdown'] = render_breakdown(result.get('breakdown_trace'))
+    return result
+
+
 @app.route('/api/calculate', methods=['POST'])
 def api_calculate():
     data = request.get_json(silent=True) or {}
@@ -140,27 +227,75 @@ def api_calculate():
             conn.commit()
             conn.close()
             result['correction_date'] = correction_date
-    return jsonify(result or {'error': 'not found'})
+    return jsonify(_with_rendered_steps(result, data) or {'error': 'not found'})
+
+@app.route('/api/calculate/batch', methods=['POST'])
+def api_calculate_batch():
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({'error': 'items must be a list'}), 400
+    save_flag = bool(data.get('save', True)) if isinstance(data, dict) else True
+    results = calculate_salary_batch(items, save_to_db=save_flag)
+    for result in results:
+        if 'error' not in result:
+            _with_rendered_steps(result, data if isinstance(data, dict) else None)
+    return jsonify({
+        'results': results,
+        'saved': sum(1 for r in results if r.get('calculation_id')),
+        'errors': sum(1 for r in results if 'error' in r),
+    })
+
+
+def _paged_response(rows, table, limit):
+    response = jsonify(rows)
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        response.headers['X-Next-Cursor'] = cursor
+    # row_counts keeps live totals per operator; date-filtered totals are not cheap, so none is sent.
+    if not request.args.get('start_date') and not request.args.get('end_date'):
+        response.headers['X-Total-Count'] = str(live_row_count(table, request.args.get('operator_id', type=int)))
+    return response
+
 
 @app.route('/api/calculations', methods=['GET'])
+@versioned('manual_calculations', 'operators')
 def api_calculations():
-    return jsonify(get_calculations_with_filters(
-        request.args.get('operator_id', type=int),
-        request.args.get('start_date'),
-        request.args.get('end_date'),
-        request.args.get('limit', type=int)
-    ))
+    render = _wants_render()
+    try:
+        limit = page_size(request.args.get('limit', type=int))
+        rows = get_calculations_with_filters(
+            request.args.get('operator_id', type=int),
+            request.args.get('start_date'),
+            request.args.get('end_date'),
+            limit,
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields'),
+            include=('calculation_breakdown',) if render else (),
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if render:
+        for row in rows:
+            row['detailed_breakdown'] = breakdown_steps(row.get('calculation_breakdown'))
+    return _paged_response(rows, 'manual_calculations', limit)
 
 
 @app.route('/api/calculations/<int:calc_id>', methods=['GET'])
+@versioned('manual_calculations')
 def api_get_calculation(calc_id):
     conn = get_db_connection()
     row = conn.execute(
         'SELECT * FROM manual_calculations WHERE id = ?',
         (calc_id,),
     ).fetchone()
+    if not row:
+        conn.close()
+        return jsonify({})
+    item = resolve_motivation_snapshots(conn, [dict(row)])[0]
     conn.close()
-    return jsonify(dict(row) if row else {})
+    item['detailed_breakdown'] = breakdown_steps(item.get('calculation_breakdown'))
+    return jsonify(item)
 
 
 @app.route('/api/calculations/<int:calc_id>', methods=['PUT'])
@@ -193,21 +328,63 @@ def api_update_calculation(calc_id):
     if not result:
         return jsonify({'error': 'not found'}), 404
 
-    return jsonify(result)
+    return jsonify(_with_rendered_steps(result, data))
 
 # =========================
 # PAYMENTS
 # =========================
 
+DUPLICATE_PAYMENT_ERROR = 'a live payment for this calculation already exists'
+
+
 @app.route('/api/payments', methods=['GET'])
+@versioned('payments', 'operators')
 def api_payments():
-    return jsonify([
-        dict(p) for p in get_payments(
+    try:
+        limit = page_size(request.args.get('limit', type=int))
+        rows = get_payments(
             request.args.get('operator_id', type=int),
             request.args.get('start_date'),
-            request.args.get('end_date')
+            request.args.get('end_date'),
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields'),
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return _paged_response(rows, 'payments', limit)
+
+@app.route('/api/payments/stats', methods=['GET'])
+@versioned('payments')
+def api_payment_stats():
+    try:
+        stats = get_payment_statistics(
+            request.args.get('start_date'),
+            request.args.get('end_date'),
+            request.args.get('operator_id', type=int),
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(stats)
+
+
+@app.route('/api/payments/bulk', methods=['POST'])
+def api_payments_bulk():
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if ids is not None and not isinstance(ids, list):
+        return jsonify({'error': 'ids must be a list'}), 400
+    try:
+        changed = bulk_update_payments(
+            data.get('action'),
+            ids=ids,
+            filters=data.get('filter'),
+            payment_date=data.get('payment_date'),
         )
-    ])
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'action': data['action'], 'updated': len(changed), 'ids': changed})
+
 
 @app.route('/api/payments/<int:pid>', methods=['PUT'])
 def api_payment_update(pid):
@@ -218,20 +395,23 @@ def api_payment_update(pid):
         existing = get_payment_by_id(pid)
         if not existing:
             return jsonify({'error': 'not found'}), 404
-        update_payment(
-            pid,
-            data.get('operator_id', existing['operator_id']),
-            data.get('calculation_date', existing['calculation_date']),
-            data.get('total_salary', existing['total_salary']),
-            data.get('period_start', existing['period_start']),
-            data.get('period_end', existing['period_end']),
-            data.get('sales_amount', existing['sales_amount']),
-            data.get('is_paid', existing['is_paid']),
-            data.get('additional_bonus', existing['additional_bonus']),
-            data.get('penalty_amount', existing['penalty_amount']),
-            data.get('correction_date'),
-            data.get('calculation_id', existing['calculation_id']),
-        )
+        try:
+            update_payment(
+                pid,
+                data.get('operator_id', existing['operator_id']),
+                data.get('calculation_date', existing['calculation_date']),
+                data.get('total_salary', existing['total_salary']),
+                data.get('period_start', existing['period_start']),
+                data.get('period_end', existing['period_end']),
+                data.get('sales_amount', existing['sales_amount']),
+                data.get('is_paid', existing['is_paid']),
+                data.get('additional_bonus', existing['additional_bonus']),
+                data.get('penalty_amount', existing['penalty_amount']),
+                data.get('correction_date'),
+                data.get('calculation_id', existing['calculation_id']),
+            )
+        except sqlite3.IntegrityError:
+            return jsonify({'error': DUPLICATE_PAYMENT_ERROR}), 409
     return jsonify({'status': 'ok'})
 
 
@@ -242,6 +422,7 @@ def api_payment_delete(pid):
 
 
 @app.route('/api/payments/<int:pid>', methods=['GET'])
+@versioned('payments')
 def api_payment_get(pid):
     conn = get_db_connection()
     row = conn.execute(
@@ -249,38 +430,173 @@ def api_payment_get(pid):
         (pid,),
     ).fetchone()
     conn.close()
-    return jsonify(dict(row) if row else {})
+    return jsonify(row or {})
+
+
+# Tables whose changes the dashboard summary reflects.
+DASHBOARD_TABLES = ('operators', 'manual_calculations', 'payments')
+DASHBOARD_RECENT_PAYMENTS = 3
+
+
+def _dashboard_summary(conn):
+    operators = [dict(row) for row in conn.execute(
+        'SELECT id, name, tax_bonus FROM operators WHERE is_deleted = 0 AND is_active = 1 ORDER BY name'
+    ).fetchall()]
+    calculations = dict(conn.execute(
+        '''
+        SELECT COALESCE(SUM(calc_count), 0) AS count,
+               COALESCE(SUM(sales_amount), 0) AS sales_amount,
+               COALESCE(SUM(salary_amount), 0) AS salary_amount
+        FROM calculation_rollups
+        '''
+    ).fetchone())
+    payments = dict(conn.execute(
+        '''
+        SELECT COALESCE(SUM(total_count), 0) AS count,
+               COALESCE(SUM(total_amount), 0) AS total_amount,
+               COALESCE(SUM(paid_count), 0) AS paid_count,
+               COALESCE(SUM(paid_amount), 0) AS paid_amount,
+               COALESCE(SUM(pending_count), 0) AS pending_count,
+               COALESCE(SUM(pending_amount), 0) AS pending_amount
+        FROM payment_rollups
+        '''
+    ).fetchone())
+    for totals in (calculations, payments):
+        for key, value in totals.items():
+            if isinstance(value, float):
+                totals[key] = round(value, 2)
+    recent = [dict(row) for row in conn.execute(
+        '''
+        SELECT p.id, p.operator_id, o.name AS operator_name, p.total_salary, p.is_paid, p.calculation_date
+        FROM payments p
+        LEFT JOIN operators o ON p.operator_id = o.id
+        WHERE p.is_deleted = 0
+        ORDER BY p.calculation_day DESC, p.id DESC
+        LIMIT ?
+        ''',
+        (DASHBOARD_RECENT_PAYMENTS,),
+    ).fetchall()]
+    return {
+        'operators': {'active': len(operators), 'items': operators},
+        'calculations': calculations,
+        'payments': payments,
+        'recent_payments': recent,
+    }
+
+
+@app.route('/api/dashboard/summary', methods=['GET'])
+@versioned(*DASHBOARD_TABLES)
+def api_dashboard_summary():
+    conn = get_db_connection()
+    # One read transaction, so the aggregates agree with each other.
+    conn.execute('BEGIN')
+    summary = _dashboard_summary(conn)
+    conn.close()
+    return jsonify(summary)
+
+
+# metric -> (rollup table, measure column)
+SERIES_METRICS = {
+    'sales': ('calculation_rollups', 'sales_amount'),
+    'kc': ('calculation_rollups', 'kc_amount'),
+    'calculations': ('calculation_rollups', 'calc_count'),
+    'salary': ('payment_rollups', 'total_amount'),
+}
+
+# bucket -> SQL expression over the rollup day number; weeks start on Monday
+# (day 0, 1970-01-01, was a Thursday).
+SERIES_BUCKETS = {
+    'day': 'day',
+    'week': 'day - ((day + 3) % 7)',
+    'month': "CAST(julianday(date(day * 86400, 'unixepoch', 'start of month')) - 2440587.5 AS INTEGER)",
+}
+
+SERIES_MAX_FILLED_BUCKETS = 3700
+
+
+def _series_bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - ((day + 3) % 7)
+    if bucket == 'month':
+        return to_day(from_day(day)[:8] + '01')
+    return day
+
+
+def _series_next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + 7
+    if bucket == 'month':
+        return _series_bucket_start(day + 31, 'month')
+    return day + 1
 
 
 @app.route('/api/dashboard/series', methods=['GET'])
+@versioned('manual_calculations', 'payments')
 def api_dashboard_series():
     metric = request.args.get('metric', 'sales')
+    bucket = request.args.get('bucket', 'day')
+    if metric not in SERIES_METRICS:
+        # Any other metric has always meant sales.
+        metric = 'sales'
+    if bucket not in SERIES_BUCKETS:
+        return jsonify({'error': f'unknown bucket: {bucket}'}), 400
     operator_id = request.args.get('operator_id', type=int)
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    conn = get_db_connection()
-    params = []
-    if metric == 'salary':
-        query = "SELECT calculation_date as dt, SUM(total_salary) as total FROM payments WHERE is_deleted = 0"
-        date_column = 'calculation_date'
-    else:
-        query = "SELECT calculation_date as dt, SUM(sales_amount) as total FROM manual_calculations WHERE is_deleted = 0"
-        date_column = 'calculation_date'
+    try:
+        condition, params = day_filter('day', start_date, end_date)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    start_day = to_day(start_date)
+    end_day = to_day(end_date)
+
+    table, column = SERIES_METRICS[metric]
+    query = f"SELECT {SERIES_BUCKETS[bucket]} AS bucket, SUM({column}) AS total FROM {table} WHERE day > ?"
+    params.insert(0, UNKNOWN_DAY)
+    query += condition
     if operator_id:
         query += " AND operator_id = ?"
         params.append(operator_id)
-    if start_date:
-        query += f" AND {date_column} >= ?"
-        params.append(start_date)
-    if end_date:
-        query += f" AND {date_column} <= ?"
-        params.append(end_date)
-    query += " GROUP BY dt ORDER BY dt"
-    rows = conn.execute(query, params).fetchall()
+    query += " GROUP BY bucket ORDER BY bucket"
+    conn = get_db_connection()
+    totals = {row['bucket']: row['total'] or 0 for row in conn.execute(query, params).fetchall()}
     conn.close()
-    labels = [r['dt'] for r in rows]
-    values = [r['total'] or 0 for r in rows]
-    return jsonify({'labels': labels, 'values': values})
+
+    # With both bounds known, empty buckets are shown as zeros rather than skipped.
+    buckets = sorted(totals)
+    if start_day is not None and end_day is not None and start_day <= end_day:
+        filled = []
+        current = _series_bucket_start(start_day, bucket)
+        while current <= end_day and len(filled) < SERIES_MAX_FILLED_BUCKETS:
+            filled.append(current)
+            current = _series_next_bucket(current, bucket)
+        if len(filled) < SERIES_MAX_FILLED_BUCKETS:
+            buckets = filled
+
+    labels = [from_day(day)[:7] if bucket == 'month' else from_day(day) for day in buckets]
+    values = [round(totals.get(day, 0), 2) for day in buckets]
+    return jsonify({'labels': labels, 'values': values, 'bucket': bucket})
+
+
+# =========================
+# BACKTEST
+# =========================
+
+
+@app.route('/api/backtest', methods=['POST'])
+def api_backtest():
+    data = request.get_json(silent=True) or {}
+    try:
+        report = backtest_motivation(
+            config_json=data.get('config_json'),
+            motivation_id=data.get('motivation_id'),
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            operator_ids=data.get('operator_ids'),
+        )
+    except (ValueError, TypeError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(report)
 
 
 # =========================
@@ -288,38 +604,76 @@ def api_dashboard_series():
 # =========================
 
 
-def _get_corrections():
-    conn = get_db_connection()
-    calculations = conn.execute(
-        '''
-        SELECT mc.*, o.name AS operator_name
+CORRECTIONS_PAGE_SIZE = 100
+CORRECTIONS_MAX_PAGE_SIZE = 500
+
+
+def _get_corrections(operator_id=None, start_date=None, end_date=None, limit=CORRECTIONS_PAGE_SIZE, cursor=None):
+    """One page of calculations with their payment, in a fixed number of queries.
+
+    Pages are keyset-paginated on (calculation_day, id) like the other lists,
+    and the payment is picked per calculation by two index lookups
+    (calculation_id first, then a legacy payment without calculation_id by
+    operator + calculation_date),
+    so the cost depends on the page size and not on the size of the history.
+    """
+    query = '''
+        SELECT mc.*, o.name AS operator_name,
+            COALESCE(
+                (SELECT p.id FROM payments p
+                 WHERE p.calculation_id = mc.id AND p.is_deleted = 0
+                 LIMIT 1),
+                (SELECT p.id FROM payments p
+                 WHERE p.operator_id = mc.operator_id AND p.calculation_date = mc.calculation_date
+                   AND p.calculation_id IS NULL AND p.is_deleted = 0
+                 LIMIT 1)
+            ) AS matched_payment_id
         FROM manual_calculations mc
         LEFT JOIN operators o ON mc.operator_id = o.id
         WHERE mc.is_deleted = 0
-        ORDER BY mc.calculation_date DESC
-        '''
-    ).fetchall()
-    results = []
-    for calc in calculations:
-        payment = conn.execute(
-            '''
-            SELECT * FROM payments
-            WHERE is_deleted = 0 AND (calculation_id = ? OR (operator_id = ? AND calculation_date = ?))
-            ORDER BY CASE WHEN calculation_id = ? THEN 0 ELSE 1 END
-            LIMIT 1
-            ''',
-            (calc['id'], calc['operator_id'], calc['calculation_date'], calc['id']),
-        ).fetchone()
-        item = dict(calc)
-        item['payment'] = dict(payment) if payment else None
-        results.append(item)
+    '''
+    params = []
+    if operator_id:
+        query += ' AND mc.operator_id = ?'
+        params.append(operator_id)
+    condition, day_params = day_filter('mc.calculation_day', start_date, end_date)
+    query += condition
+    params.extend(day_params)
+
+    conn = get_db_connection()
+    results = [dict(row) for row in keyset_page(conn, query, params, 'mc', cursor, limit)]
+    payment_ids = [item['matched_payment_id'] for item in results if item['matched_payment_id']]
+    payments = {}
+    if payment_ids:
+        placeholders = ', '.join('?' for _ in payment_ids)
+        for row in conn.execute(f'SELECT * FROM payments WHERE id IN ({placeholders})', payment_ids).fetchall():
+            payments[row['id']] = dict(row)
+    for item in results:
+        item['payment'] = payments.get(item.pop('matched_payment_id'))
+    resolve_motivation_snapshots(conn, results)
     conn.close()
     return results
 
 
 @app.route('/api/corrections', methods=['GET'])
+@versioned('manual_calculations', 'payments', 'operators')
 def api_corrections():
-    return jsonify(_get_corrections())
+    limit = min(max(request.args.get('limit', CORRECTIONS_PAGE_SIZE, type=int), 1), CORRECTIONS_MAX_PAGE_SIZE)
+    try:
+        corrections = _get_corrections(
+            request.args.get('operator_id', type=int),
+            request.args.get('start_date'),
+            request.args.get('end_date'),
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    response = jsonify(corrections)
+    cursor = next_cursor(corrections, limit)
+    if cursor:
+        response.headers['X-Next-Cursor'] = cursor
+    return response
 
 
 @app.route('/api/corrections/<int:calc_id>', methods=['PUT'])
@@ -348,7 +702,7 @@ def api_update_correction(calc_id):
     )
     if not result:
         return jsonify({'error': 'not found'}), 404
-    return jsonify(result)
+    return jsonify(_with_rendered_steps(result, data))
 
 
 @app.route('/api/corrections/<int:calc_id>', methods=['DELETE'])
@@ -361,11 +715,13 @@ def api_delete_correction(calc_id):
 # =========================
 
 @app.route('/api/motivations', methods=['GET'])
+@versioned('motivations')
 def api_get_motivations():
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
     return jsonify(get_motivations(include_deleted=include_deleted))
 
 @app.route('/api/motivations/<int:mid>', methods=['GET'])
+@versioned('motivations')
 def api_get_motivation(mid):
     return jsonify(get_motivation(mid))
 
@@ -413,7 +769,10 @@ def r_calc(i): restore_calculation(i); return jsonify({'ok': True})
 def t_pay(i): soft_delete_payment(i); return jsonify({'ok': True})
 
 @app.route('/api/trash/payment/<int:i>/restore', methods=['POST'])
-def r_pay(i): restore_payment(i); return jsonify({'ok': True})
+def r_pay(i):
+    if not restore_payment(i):
+        return jsonify({'ok': False, 'error': DUPLICATE_PAYMENT_ERROR}), 409
+    return jsonify({'ok': True})
 
 @app.route('/api/trash/motivation/<int:i>', methods=['POST'])
 def t_mot(i): soft_delete_motivation(i); return jsonify({'ok': True})
@@ -423,11 +782,12 @@ def r_mot(i): restore_motivation(i); return jsonify({'ok': True})
 
 
 @app.route('/api/trash/summary', methods=['GET'])
+@versioned()
 def trash_summary():
     return jsonify({
-        'operators': [dict(r) for r in get_deleted_operators()],
-        'payments': [dict(r) for r in get_deleted_payments()],
-        'calculations': [dict(r) for r in get_deleted_calculations()],
+        'operators': get_deleted_operators(),
+        'payments': get_deleted_payments(),
+        'calculations': get_deleted_calculations(),
         'motivations': get_deleted_motivations(),
     })
 
@@ -446,9 +806,92 @@ def delete_permanently(entity, item_id):
         return jsonify({'error': 'unknown entity'}), 400
     return jsonify({'ok': True})
 
+# =========================
+# EVENTS
+# =========================
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'invalid Last-Event-ID'}), 400
+    if not events.hub.open_stream():
+        response = jsonify({'error': 'too many event streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(events.STREAM_SECONDS)
+        return response
+    response = app.response_class(events.stream(events.hub, last_id), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the client left before the first chunk.
+    response.call_on_close(events.hub.close_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# =========================
+# METRICS / DIAGNOSTICS
+# =========================
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# The admin endpoints show SQL and change server state: with ADMIN_TOKEN set
+# they need it in X-Admin-Token, otherwise they only answer on loopback.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+LOOPBACK_ADDRS = ('127.0.0.1', '::1')
+
+
+def admin_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN:
+            allowed = hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+        else:
+            allowed = request.remote_addr in LOOPBACK_ADDRS
+        if not allowed:
+            return jsonify({'error': 'forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/admin/slow-queries', methods=['GET'])
+@admin_only
+def api_slow_queries():
+    threshold = slow_queries.threshold
+    return jsonify({
+        'threshold_ms': None if threshold is None else threshold * 1000.0,
+        'capacity': slow_queries.CAPACITY,
+        'entries': slow_queries.entries(),
+    })
+
+
+@app.route('/api/admin/slow-queries', methods=['PUT'])
+@admin_only
+def api_set_slow_query_threshold():
+    data = request.get_json(silent=True) or {}
+    value = data.get('threshold_ms')
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+        return jsonify({'error': 'threshold_ms must be a non-negative number or null'}), 400
+    slow_queries.set_threshold(value)
+    if data.get('clear'):
+        slow_queries.clear()
+    return jsonify({'threshold_ms': value})
+
+
+@app.route('/api/admin/slow-queries/dump', methods=['POST'])
+@admin_only
+def api_dump_slow_queries():
+    filename, body = slow_queries.dump()
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 # =========================
 # RUN
 # =========================
 
 if __name__ == '__main__':
+    static_assets.build()
     app.run(debug=True, port=5000)
@@ -0,0 +1,153 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+INSERT_SQL = (
+    'INSERT INTO action_log (action_type, action_details, operator_id, performed_by, action_date) '
+    'VALUES (?, ?, ?, ?, ?)'
+)
+
+
+def _utc_timestamp():
+    # Same format as CURRENT_TIMESTAMP, captured when the action happens
+    # rather than when the batch reaches the database.
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class AuditWriter:
+    """Background writer that group-commits action_log rows.
+
+    Callers enqueue events and return immediately; one thread drains the queue
+    and commits every `batch_size` events or every `flush_interval` seconds,
+    whichever comes first. With synchronous=True every event is written and
+    committed before enqueue() returns (used by tests and CLI scripts).
+    """
+
+    def __init__(self, db_path, batch_size=200, flush_interval=0.25, synchronous=False):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._conn = None
+
+    # ---------- public API ----------
+
+    def enqueue(self, action_type, details=None, operator_id=None, performed_by='system'):
+        row = (action_type, details, operator_id, performed_by, _utc_timestamp())
+        if self.synchronous:
+            with self._lock:
+                self._write([row])
+            return
+        self._ensure_thread()
+        self._queue.put(row)
+
+    def flush(self, timeout=5.0):
+        """Block until everything enqueued so far has been committed."""
+        if self.synchronous or not self._is_running():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def shutdown(self, timeout=5.0):
+        if not self._is_running():
+            self._close_connection()
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------- worker ----------
+
+    def _is_running(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_thread(self):
+        if self._is_running():
+            return
+        with self._lock:
+            if self._is_running():
+                return
+            if self._pid != os.getpid():
+                # Forked child: the parent's queue and connection are not ours.
+                self._queue = queue.Queue()
+                self._conn = None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+        self._close_connection()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA busy_timeout = 5000')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+        return self._conn
+
+    def _write(self, rows):
+        try:
+            conn = self._connection()
+            conn.executemany(INSERT_SQL, rows)
+            conn.commit()
+        except sqlite3.Error:
+            logger.exception('audit log: failed to write %d event(s)', len(rows))
+            self._close_connection()
+
+    def _close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+
+
+_writer = None
+
+
+def get_writer(db_path):
+    global _writer
+    if _writer is None:
+        _writer = AuditWriter(
+            db_path,
+            synchronous=os.environ.get('AUDIT_LOG_SYNC', '').lower() in ('1', 'true', 'yes'),
+        )
+        atexit.register(_writer.shutdown)
+    return _writer
@@ -0,0 +1,215 @@
+import argparse
+import json
+import sqlite3
+import sys
+
+from calculations import _calculate_components, salary_totals
+from config import DB_PATH
+from day_keys import day_filter
+from motivation_engine import MotivationEngine
+
+try:
+    import numpy as np
+    from motivation_batch import derive_amounts_batch, evaluate_batch
+except ImportError:  # numpy is optional; fall back to the scalar pipeline
+    np = None
+
+CHUNK_SIZE = 5000
+
+HISTORY_COLUMNS = (
+    "id", "operator_id", "kc_amount", "non_kc_amount", "sales_amount", "redemption_percent",
+    "working_days_in_period", "additional_bonus", "penalty_amount", "bonus_percent_salary",
+    "bonus_percent_sales", "include_redemption_percent", "total_salary",
+)
+
+
+def _read_only_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def _resolve_motivation(conn, config_json=None, motivation_id=None):
+    if config_json is not None:
+        if not isinstance(config_json, str):
+            config_json = json.dumps(config_json)
+        MotivationEngine.compile(json.loads(config_json))
+        return {"id": None, "name": "draft", "config_json": config_json, "is_deleted": 0, "is_active": 1}
+    if motivation_id is None:
+        raise ValueError("config_json or motivation_id is required")
+    row = conn.execute("SELECT id, name, config_json FROM motivations WHERE id = ?", (motivation_id,)).fetchone()
+    if not row:
+        raise ValueError(f"motivation {motivation_id} not found")
+    return {"id": row["id"], "name": row["name"], "config_json": row["config_json"], "is_deleted": 0, "is_active": 1}
+
+
+def _operator_ids(value):
+    """operator_ids from a request as a list of ints; None or [] means every operator."""
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        raise ValueError("operator_ids must be a list of integers")
+    try:
+        return [int(item) for item in value]
+    except (TypeError, ValueError):
+        raise ValueError("operator_ids must be a list of integers")
+
+
+def _history_query(start_date, end_date, operator_ids):
+    condition, params = day_filter("calculation_day", start_date, end_date)
+    query = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM manual_calculations WHERE is_deleted = 0{condition}"
+    if operator_ids:
+        query += f" AND operator_id IN ({', '.join('?' for _ in operator_ids)})"
+        params.extend(operator_ids)
+    return query, params
+
+
+def _simulate_scalar(columns, motivation, tax_bonuses):
+    totals = []
+    for values in zip(*(columns[name] for name in HISTORY_COLUMNS)):
+        row = dict(zip(HISTORY_COLUMNS, values))
+        calc_result, _ = _calculate_components(
+            {"tax_bonus": tax_bonuses.get(row["operator_id"], 0)},
+            motivation,
+            row["kc_amount"],
+            row["non_kc_amount"],
+            row["sales_amount"],
+            row["redemption_percent"],
+            row["working_days_in_period"],
+            row["additional_bonus"],
+            row["penalty_amount"],
+            row["bonus_percent_salary"],
+            row["bonus_percent_sales"],
+            bool(row["include_redemption_percent"] if row["include_redemption_percent"] is not None else 1),
+        )
+        totals.append(calc_result["total_salary"])
+    return totals
+
+
+def _simulate_vectorized(columns, plan, tax_bonuses):
+    """The scalar pipeline one column at a time: evaluate_batch, then calculations.salary_totals."""
+
+    def column(name, default=np.nan):
+        return np.array([default if value is None else value for value in columns[name]], dtype=np.float64)
+
+    kc, _, sales, redemption = derive_amounts_batch(
+        column("kc_amount"), column("non_kc_amount"), column("sales_amount"), column("redemption_percent")
+    )
+    result = evaluate_batch(plan, kc, sales, redemption, column("working_days_in_period", 0.0))
+    stages = salary_totals(
+        result,
+        column("include_redemption_percent", 1.0) != 0,
+        column("additional_bonus", 0.0),
+        column("penalty_amount", 0.0),
+        column("bonus_percent_salary", 0.0),
+        column("bonus_percent_sales", 0.0),
+        sales,
+        np.array([float(tax_bonuses.get(op_id) or 0) for op_id in columns["operator_id"]]),
+        where=np.where,
+    )
+    return stages["total"].tolist()
+
+
+def backtest_motivation(
+    config_json=None,
+    motivation_id=None,
+    start_date=None,
+    end_date=None,
+    operator_ids=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """Replay stored calculation inputs against a motivation without writing anything.
+
+    Returns per-operator and aggregate totals: what was stored, what the given
+    motivation (a draft config_json or an existing motivation id) would have
+    paid, and the delta. Operator tax bonuses are taken as they are today.
+    """
+    operator_ids = _operator_ids(operator_ids)
+    conn = _read_only_connection()
+    try:
+        motivation = _resolve_motivation(conn, config_json, motivation_id)
+        plan = MotivationEngine.get_plan(motivation["id"], motivation["config_json"])
+        operators = {
+            row["id"]: row
+            for row in conn.execute("SELECT id, name, tax_bonus FROM operators").fetchall()
+        }
+        tax_bonuses = {op_id: row["tax_bonus"] or 0 for op_id, row in operators.items()}
+
+        per_operator = {}
+        query, params = _history_query(start_date, end_date, operator_ids)
+        cursor = conn.cursor()
+        cursor.row_factory = None  # plain tuples, transposed into columns per chunk
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            columns = dict(zip(HISTORY_COLUMNS, zip(*rows)))
+            if np is not None:
+                simulated = _simulate_vectorized(columns, plan, tax_bonuses)
+            else:
+                simulated = _simulate_scalar(columns, motivation, tax_bonuses)
+            for operator_id, stored, new_total in zip(columns["operator_id"], columns["total_salary"], simulated):
+                stats = per_operator.setdefault(operator_id, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += stored or 0.0
+                stats[2] += new_total
+    finally:
+        conn.close()
+
+    report = []
+    for operator_id, (count, stored, simulated) in sorted(per_operator.items()):
+        operator = operators.get(operator_id)
+        report.append({
+            "operator_id": operator_id,
+            "operator_name": operator["name"] if operator else None,
+            "calculations": count,
+            "stored_total": round(stored, 2),
+            "simulated_total": round(simulated, 2),
+            "delta": round(simulated - stored, 2),
+        })
+
+    stored_sum = sum(item[1] for item in per_operator.values())
+    simulated_sum = sum(item[2] for item in per_operator.values())
+    return {
+        "motivation": {"id": motivation["id"], "name": motivation["name"]},
+        "start_date": start_date,
+        "end_date": end_date,
+        "operators": report,
+        "totals": {
+            "calculations": sum(item[0] for item in per_operator.values()),
+            "stored_total": round(stored_sum, 2),
+            "simulated_total": round(simulated_sum, 2),
+            "delta": round(simulated_sum - stored_sum, 2),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay historical calculations against a motivation")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--motivation-id", type=int)
+    source.add_argument("--config-file", help="JSON file with a draft motivation config")
+    parser.add_argument("--start-date")
+    parser.add_argument("--end-date")
+    parser.add_argument("--operator", type=int, action="append", dest="operator_ids")
+    args = parser.parse_args(argv)
+
+    config_json = None
+    if args.config_file:
+        with open(args.config_file, encoding="utf-8") as f:
+            config_json = f.read()
+    report = backtest_motivation(
+        config_json=config_json,
+        motivation_id=args.motivation_id,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        operator_ids=args.operator_ids,
+    )
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""End-to-end API benchmark on a generated dataset, through the Flask test client.
+
+    python generate_dataset.py --scale medium
+    python bench_api.py --data bench_data/medium --output bench_results/medium.json
+    python bench_api.py --data bench_data/medium --compare bench_results/medium.json
+
+Each scenario sends --requests requests (after --warmup unmeasured ones) with
+parameters drawn from the dataset by a seeded generator, so two runs on the
+same dataset send the same requests. The report is JSON: per scenario the
+p50/p95/p99/mean/max latency in ms, throughput, mean body size and SQL
+statements per request, plus the commit, Python/SQLite versions and the
+dataset description, so runs can be compared across commits (--compare).
+
+The app is imported after changing into the dataset directory, because
+config.DB_PATH is relative; the repository's own operators.db is never
+touched. /api/calculate runs with save=false unless --writes is given,
+which also adds a scenario that saves calculations (and so modifies the
+dataset).
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from day_keys import from_day
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CURSOR_PAGES = 20
+
+
+# Each builder gets (rng, context, state) and returns (method, path, json body or None).
+# state["next_cursor"] holds the X-Next-Cursor of the scenario's previous response.
+
+def _window(rng, context, days):
+    first = context["first_day"]
+    last = max(context["last_day"] - days + 1, first)
+    start = rng.randint(first, last)
+    return from_day(start), from_day(start + days - 1)
+
+
+def _calculate_body(rng, context, save):
+    sales = round(rng.lognormvariate(11.0, 0.5), 2)
+    kc = round(sales * min(max(rng.gauss(55.0, 9.0), 15.0), 95.0) / 100.0, 2)
+    end = date.fromisoformat(from_day(context["last_day"]))
+    return {
+        "operator_id": rng.choice(context["operators"]),
+        "kc_amount": kc,
+        "non_kc_amount": round(sales - kc, 2),
+        "sales_amount": sales,
+        "working_days_in_period": 5,
+        "period_start": (end - timedelta(days=6)).isoformat(),
+        "period_end": end.isoformat(),
+        "save": save,
+    }
+
+
+def _paged(path, rng, context, state, **params):
+    """Walk a list CURSOR_PAGES pages deep, then start over from the first page."""
+    cursor = state.get("next_cursor")
+    page = state.get("page", 0)
+    if cursor and page < CURSOR_PAGES:
+        params["cursor"] = cursor
+        state["page"] = page + 1
+    else:
+        state["page"] = 1
+    query = "&".join(f"{name}={value}" for name, value in params.items())
+    return "GET", f"{path}?{query}", None
+
+
+def _operator_list(path):
+    def build(rng, context, state):
+        return "GET", f"{path}?operator_id={rng.choice(context['operators'])}&limit=100", None
+    return build
+
+
+def _range_list(path, days):
+    def build(rng, context, state):
+        start, end = _window(rng, context, days)
+        return "GET", f"{path}?start_date={start}&end_date={end}&limit=100", None
+    return build
+
+
+def _series(metric, bucket, days=None, by_operator=False):
+    def build(rng, context, state):
+        query = f"metric={metric}&bucket={bucket}"
+        if days:
+            start, end = _window(rng, context, days)
+            query += f"&start_date={start}&end_date={end}"
+        if by_operator:
+            query += f"&operator_id={rng.choice(context['operators'])}"
+        return "GET", f"/api/dashboard/series?{query}", None
+    return build
+
+
+SCENARIOS = {
+    "calculate": lambda rng, context, state: ("POST", "/api/calculate", _calculate_body(rng, context, False)),
+    "calculations_first_page": lambda rng, context, state: ("GET", "/api/calculations?limit=100", None),
+    "calculations_cursor": lambda rng, context, state: _paged("/api/calculations", rng, context, state, limit=100),
+    "calculations_operator": _operator_list("/api/calculations"),
+    "calculations_month": _range_list("/api/calculations", 30),
+    "payments_first_page": lambda rng, context, state: ("GET", "/api/payments?limit=100", None),
+    "payments_cursor": lambda rng, context, state: _paged("/api/payments", rng, context, state, limit=100),
+    "payments_operator": _operator_list("/api/payments"),
+    "payments_month": _range_list("/api/payments", 30),
+    "corrections_first_page": lambda rng, context, state: ("GET", "/api/corrections?limit=100", None),
+    "corrections_cursor": lambda rng, context, state: _paged("/api/corrections", rng, context, state, limit=100),
+    "corrections_operator": _operator_list("/api/corrections"),
+    "corrections_month": _range_list("/api/corrections", 30),
+    "series_sales_day_quarter": _series("sales", "day", days=90),
+    "series_salary_month_all": _series("salary", "month"),
+    "series_kc_week_operator": _series("kc", "week", days=180, by_operator=True),
+    "trash_summary": lambda rng, context, state: ("GET", "/api/trash/summary", None),
+}
+
+WRITE_SCENARIOS = {
+    "calculate_save": lambda rng, context, state: ("POST", "/api/calculate", _calculate_body(rng, context, True)),
+}
+
+
+def _load_context(path):
+    """Operator ids and the calculation day range to draw request parameters from."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        operators = [row[0] for row in conn.execute(
+            "SELECT id FROM operators WHERE is_deleted = 0 AND motivation_id IS NOT NULL ORDER BY id"
+        )]
+        first_day, last_day = conn.execute(
+            "SELECT MIN(calculation_day), MAX(calculation_day) FROM manual_calculations WHERE calculation_day >= 0"
+        ).fetchone()
+    finally:
+        conn.close()
+    if not operators or first_day is None:
+        raise SystemExit(f"{path} has no live operators with a motivation or no dated calculations")
+    return {"operators": operators, "first_day": first_day, "last_day": last_day}
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of a sorted list."""
+    return ordered[max(math.ceil(percent / 100.0 * len(ordered)) - 1, 0)]
+
+
+def _run_scenario(client, build, context, requests, warmup, seed, headers):
+    rng = random.Random(seed)
+    state = {}
+    timings = []
+    sizes = []
+    queries = []
+    errors = 0
+    started = time.perf_counter()
+    for index in range(warmup + requests):
+        method, path, body = build(rng, context, state)
+        if index == warmup:
+            started = time.perf_counter()
+        request_started = time.perf_counter()
+        response = client.open(path, method=method, json=body, headers=headers)
+        data = response.get_data()
+        elapsed = time.perf_counter() - request_started
+        state["next_cursor"] = response.headers.get("X-Next-Cursor")
+        response.close()
+        if index < warmup:
+            continue
+        if response.status_code != 200:
+            errors += 1
+        timings.append(elapsed)
+        sizes.append(len(data))
+        queries.append(int(response.headers.get("X-Query-Count", 0)))
+    total = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(_percentile(timings, 50) * 1000.0, 3),
+        "p95_ms": round(_percentile(timings, 95) * 1000.0, 3),
+        "p99_ms": round(_percentile(timings, 99) * 1000.0, 3),
+        "mean_ms": round(sum(timings) / len(timings) * 1000.0, 3),
+        "max_ms": round(timings[-1] * 1000.0, 3),
+        "throughput_rps": round(requests / total, 1) if total else None,
+        "mean_bytes": round(sum(sizes) / len(sizes)),
+        "mean_queries": round(sum(queries) / len(queries), 2),
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True, timeout=30
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _environment(data_dir, args):
+    dataset = None
+    description = os.path.join(data_dir, "dataset.json")
+    if os.path.exists(description):
+        with open(description, encoding="utf-8") as f:
+            dataset = json.load(f)
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "dataset": dataset,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "accept_encoding": args.accept_encoding,
+    }
+
+
+def compare(baseline, current):
+    """Text table of the latency percentiles and throughput of two reports."""
+    lines = [f"{'scenario':<28} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            old, new = before.get(metric), result.get(metric)
+            change = f"{(new - old) / old * 100.0:+.1f}%" if old and new is not None else "n/a"
+            lines.append(f"{name:<28} {metric:<15} {old!s:>10} {new!s:>10} {change:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API on a generated dataset")
+    parser.add_argument("--data", default=os.path.join("bench_data", "small"),
+                        help="directory with operators.db (see generate_dataset.py)")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--accept-encoding", default="gzip, deflate, br",
+                        help="Accept-Encoding sent with every request ('' for none)")
+    parser.add_argument("--writes", action="store_true", help="also save calculations (modifies the dataset)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="print the change against an earlier report")
+    args = parser.parse_args(argv)
+
+    scenarios = dict(SCENARIOS, **(WRITE_SCENARIOS if args.writes else {}))
+    if args.scenario:
+        unknown = set(args.scenario) - set(scenarios)
+        if unknown:
+            parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+        scenarios = {name: scenarios[name] for name in args.scenario}
+    if args.requests < 1:
+        parser.error("--requests must be at least 1")
+
+    data_dir = os.path.abspath(args.data)
+    db_path = os.path.join(data_dir, "operators.db")
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} not found; create it with generate_dataset.py")
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    context = _load_context(db_path)
+    environment = _environment(data_dir, args)
+
+    os.chdir(data_dir)
+    app_module = importlib.import_module("app")
+    config = importlib.import_module("config")
+    client = app_module.app.test_client()
+    headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else {}
+
+    results = {}
+    try:
+        for index, (name, build) in enumerate(scenarios.items()):
+            results[name] = _run_scenario(
+                client, build, context, args.requests, args.warmup, args.seed + index, headers
+            )
+            result = results[name]
+            print(
+                f"{name:<28} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+                f"p99 {result['p99_ms']:9.2f} ms  {result['throughput_rps']:8.1f} req/s"
+                + (f"  {result['errors']} errors" if result["errors"] else ""),
+                file=sys.stderr,
+            )
+    finally:
+        config.shutdown_action_log()
+        config.close_all_connections()
+
+    report = {"environment": environment, "scenarios": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
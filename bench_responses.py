@@ -0,0 +1,65 @@
+"""Measure the cost of the API response layer on real calculation rows.
+
+Compares the old path (dict copies + Flask's stdlib encoder) with
+responses.dumps_bytes, and the time and size of each compression step.
+Reads operators.db only; rows are repeated to reach --rows.
+"""
+import argparse
+import gzip
+import json
+import sqlite3
+import time
+
+import responses
+from config import DB_PATH
+
+
+def _load_rows(count):
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM manual_calculations ORDER BY id").fetchall()
+    conn.close()
+    if not rows:
+        raise SystemExit("manual_calculations is empty")
+    return (rows * (count // len(rows) + 1))[:count]
+
+
+def _best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON encoding and compression of API responses")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rows = _load_rows(args.rows)
+    print(f"{len(rows)} rows, encoder: {'orjson' if responses.orjson else 'stdlib json'}")
+
+    stdlib_time, body = _best_of(
+        args.repeat, lambda: json.dumps([dict(r) for r in rows], sort_keys=True).encode("utf-8")
+    )
+    print(f"  dict copies + stdlib json  {stdlib_time * 1000:8.1f} ms  {len(body):>10} bytes")
+    fast_time, body = _best_of(args.repeat, lambda: responses.dumps_bytes(rows))
+    print(f"  responses.dumps_bytes      {fast_time * 1000:8.1f} ms  {len(body):>10} bytes")
+
+    gzip_time, compressed = _best_of(
+        args.repeat, lambda: gzip.compress(body, compresslevel=responses.GZIP_LEVEL, mtime=0)
+    )
+    print(f"  gzip level {responses.GZIP_LEVEL}               {gzip_time * 1000:8.1f} ms  {len(compressed):>10} bytes")
+    if responses.brotli is not None:
+        brotli_time, compressed = _best_of(
+            args.repeat, lambda: responses.brotli.compress(body, quality=responses.BROTLI_QUALITY)
+        )
+        print(f"  brotli quality {responses.BROTLI_QUALITY}           {brotli_time * 1000:8.1f} ms  {len(compressed):>10} bytes")
+
+
+if __name__ == "__main__":
+    main()
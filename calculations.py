@@ -1,42 +1,168 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 
 from config import get_db_connection, log_action
-from motivation_engine import MotivationEngine, derive_amounts
+from motivation_engine import EMPTY_PLAN, MotivationEngine, derive_amounts
+from motivations import resolve_motivation_snapshots, store_motivation_version
+from day_keys import day_filter
+from pagination import keyset_page, select_columns
+from payments import find_live_payment
 
 
 def _fmt_money(value: float) -> str:
     return f"{value:,.2f}".replace(",", " ")
 
-def ensure_calculation_columns(conn):
-    columns = {row["name"] for row in conn.execute("PRAGMA table_info(manual_calculations)").fetchall()}
-    required = {
-        "period_start": "TEXT",
-        "period_end": "TEXT",
-        "additional_bonus": "REAL DEFAULT 0",
-        "penalty_amount": "REAL DEFAULT 0",
-        "comment": "TEXT",
-        "is_deleted": "INTEGER DEFAULT 0",
-        "deleted_at": "TEXT",
-        "redemption_percent": "REAL DEFAULT 0",
-        "manual_fixed_bonus": "REAL DEFAULT 0",
-        "manual_penalty": "REAL DEFAULT 0",
-        "bonus_percent_salary": "REAL DEFAULT 0",
-        "bonus_percent_sales": "REAL DEFAULT 0",
-        "applied_motivation_id": "INTEGER",
-        "applied_motivation_name": "TEXT",
-        "motivation_snapshot": "TEXT",
-        "calculation_breakdown": "TEXT",
-        "working_days_in_period": "REAL DEFAULT 0",
-        "plan_target": "REAL DEFAULT 0",
-        "plan_completion": "REAL DEFAULT 0",
-        "include_redemption_percent": "INTEGER DEFAULT 1",
-        "correction_date": "TEXT",
-    }
-    for col, ddl in required.items():
-        if col not in columns:
-            conn.execute(f"ALTER TABLE manual_calculations ADD COLUMN {col} {ddl}")
 
+# =========================
+# BREAKDOWN TRACE
+# =========================
+# _calculate_components records each step as [code, *operands]; the Russian
+# text is only produced by render_breakdown() when someone asks to read it.
+
+def _render_extra_bonuses(base, percent_salary, from_salary, sales, percent_sales, from_sales, prev, after):
+    details = []
+    if from_salary:
+        details.append(
+            "от расчета: {base} × {percent:.2f}% = {delta} руб.".format(
+                base=_fmt_money(base), percent=percent_salary, delta=_fmt_money(from_salary)
+            )
+        )
+    if from_sales:
+        details.append(
+            "от продаж: {base} × {percent:.2f}% = {delta} руб.".format(
+                base=_fmt_money(sales), percent=percent_sales, delta=_fmt_money(from_sales)
+            )
+        )
+    return f"Дополнительные бонусы ({'; '.join(details)}). Сумма была {prev:.2f} руб., стала {after:.2f} руб."
+
+
+def _render_percent_step(title):
+    def render(base, percent, delta, prev, after):
+        return (
+            "{title}: база {base} руб., ставка {percent:.2f}%. Формула: {base} × {percent:.2f}% = {delta} руб. "
+            "Сумма была {prev:.2f} руб., стала {after:.2f} руб."
+        ).format(title=title, base=_fmt_money(base), percent=percent, delta=_fmt_money(delta), prev=prev, after=after)
+
+    return render
+
+
+_STEP_RENDERERS = {
+    "input": lambda kc, non_kc, sales, percent: (
+        "Исходные данные: выкупленные заказы {kc} руб., невыкупленные {non_kc} руб., общая сумма продаж {sales} руб., процент выкупа {percent:.1f}%".format(
+            kc=_fmt_money(kc), non_kc=_fmt_money(non_kc), sales=_fmt_money(sales), percent=percent
+        )
+    ),
+    "base_salary": lambda amount, prev, after: (
+        f"Базовая часть мотивации: фиксированная сумма {_fmt_money(amount)} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб."
+    ),
+    "sales_percent": _render_percent_step("Процент с продаж"),
+    "redemption_percent": _render_percent_step("Процент с выкупа"),
+    "redemption_disabled": lambda: "Процент с выкупа отключен для расчета",
+    "config_bonuses": lambda amount, prev, after: (
+        f"Фиксированные бонусы мотивации: +{_fmt_money(amount)} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб."
+    ),
+    "manual_bonus": lambda amount, prev, after: (
+        f"Ручной фиксированный бонус: +{_fmt_money(amount)} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб."
+    ),
+    "penalty": lambda amount, prev, after: (
+        f"Штраф: -{_fmt_money(amount)} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб."
+    ),
+    "plan_multiplier": lambda multiplier, prev, after, target, completion: (
+        f"Множитель выполнения плана ({multiplier:.2f}): {prev:.2f} руб. → {after:.2f} руб. (план {target:.2f}, выполнение {(completion * 100):.1f}% )"
+    ),
+    "percent_bonus": _render_percent_step("Процентный бонус мотивации"),
+    "extra_bonuses": _render_extra_bonuses,
+    "tax_bonus": _render_percent_step("Надбавка оператора за налог"),
+    "total": lambda total: f"Итоговая выплата: {_fmt_money(total)} руб.",
+}
+
+
+def render_breakdown(trace):
+    """Turn a stored trace into the human-readable list of steps."""
+    return [_STEP_RENDERERS[step[0]](*step[1:]) for step in trace or [] if step and step[0] in _STEP_RENDERERS]
+
+
+def breakdown_steps(breakdown_json):
+    """Readable steps for a calculation_breakdown value, old (prose) or new (trace) format."""
+    if not breakdown_json:
+        return []
+    try:
+        breakdown = json.loads(breakdown_json) if isinstance(breakdown_json, str) else breakdown_json
+    except ValueError:
+        return []
+    if "trace" in breakdown:
+        return render_breakdown(breakdown["trace"])
+    return breakdown.get("detailed_steps") or []
+
+
+# Steps of the salary after the motivation plan, in the order they apply; the
+# names are the breakdown trace codes.
+SALARY_STEPS = (
+    "base_salary", "sales_percent", "redemption_percent", "config_bonuses", "manual_bonus", "penalty",
+    "plan_multiplier", "percent_bonus", "extra_bonuses",
+)
+
+
+def _scalar_where(condition, if_true, if_false):
+    return if_true if condition else if_false
+
+
+def salary_totals(
+    plan_result,
+    include_redemption_percent,
+    manual_bonus,
+    manual_penalty,
+    bonus_percent_salary,
+    bonus_percent_sales,
+    sales,
+    tax_bonus_percent,
+    where=_scalar_where,
+):
+    """The salary arithmetic that follows the motivation plan, step by step.
+
+    `plan_result` is a MotivationRuleResult or the dict of columns from
+    motivation_batch.evaluate_batch; the other arguments are floats or NumPy
+    columns alike (pass where=np.where for columns). Returns the subtotal
+    after each of SALARY_STEPS plus the amounts added along the way.
+    _calculate_components and the backtest both call this, so a simulated
+    total is computed exactly like a saved one.
+    """
+    def component(name):
+        return plan_result[name] if isinstance(plan_result, dict) else getattr(plan_result, name)
+
+    redemption_component = where(include_redemption_percent, component("redemption_component"), 0.0)
+    stages = {}
+    subtotal = 0.0
+    for name, amount in (
+        ("base_salary", component("base_salary")),
+        ("sales_percent", component("sales_component")),
+        ("redemption_percent", redemption_component),
+        ("config_bonuses", component("fixed_bonuses")),
+        ("manual_bonus", manual_bonus),
+    ):
+        subtotal = subtotal + amount
+        stages[name] = subtotal
+    subtotal = subtotal - manual_penalty
+    stages["penalty"] = subtotal
+    subtotal = subtotal * component("plan_multiplier")  # exact no-op for a multiplier of 1
+    stages["plan_multiplier"] = subtotal
+    percent_bonus_amount = subtotal * (component("percentage_bonus_value") / 100.0)
+    subtotal = subtotal + percent_bonus_amount
+    stages["percent_bonus"] = subtotal
+    bonus_from_salary = subtotal * (bonus_percent_salary / 100.0)
+    bonus_from_sales = sales * (bonus_percent_sales / 100.0)
+    subtotal = subtotal + (bonus_from_salary + bonus_from_sales)
+    stages["extra_bonuses"] = subtotal
+    tax_bonus = where(tax_bonus_percent > 0, subtotal * (tax_bonus_percent / 100.0), 0)
+    stages.update(
+        redemption_component=redemption_component,
+        percent_bonus_amount=percent_bonus_amount,
+        bonus_from_salary=bonus_from_salary,
+        bonus_from_sales=bonus_from_sales,
+        tax_bonus=tax_bonus,
+        total=subtotal + tax_bonus,
+    )
+    return stages
 
 
 def _calculate_components(
@@ -57,14 +183,15 @@ def _calculate_components(
         kc_amount, non_kc_amount, sales_amount, redemption_percent
     )
 
-    config = {}
+    plan = EMPTY_PLAN
     applied_motivation_name = None
     if motivation and int(motivation["is_deleted"]) == 0 and int(motivation["is_active"]) == 1:
         applied_motivation_name = motivation["name"]
-        config = MotivationEngine.parse_config(motivation["config_json"])
+        plan = MotivationEngine.get_plan(motivation["id"], motivation["config_json"])
+    config = plan.config
 
-    motivation_result = MotivationEngine.calculate_components(
-        config=config,
+    motivation_result = MotivationEngine.evaluate(
+        plan,
         kc_amount=kc_value,
         sales_amount=sales_value,
         redemption_percent=redemption_percent,
@@ -72,141 +199,61 @@ def _calculate_components(
     )
 
     kc_percent = motivation_result.kc_percent
-    subtotal = 0.0
-    steps = []
-
-    steps.append(
-        "Исходные данные: выкупленные заказы {kc} руб., невыкупленные {non_kc} руб., общая сумма продаж {sales} руб., процент выкупа {percent:.1f}%".format(
-            kc=_fmt_money(kc_value),
-            non_kc=_fmt_money(non_kc_value),
-            sales=_fmt_money(sales_value),
-            percent=redemption_percent,
-        )
+    manual_bonus = float(additional_bonus or 0)
+    manual_penalty = float(penalty_amount or 0)
+    bonus_salary_percent = float(bonus_percent_salary or 0)
+    bonus_sales_percent = float(bonus_percent_sales or 0)
+    tax_bonus_percent = float(operator["tax_bonus"] or 0)
+    stages = salary_totals(
+        motivation_result, include_redemption_percent, manual_bonus, manual_penalty,
+        bonus_salary_percent, bonus_sales_percent, sales_value, tax_bonus_percent,
     )
+    before = dict(zip(SALARY_STEPS, (0.0,) + tuple(stages[name] for name in SALARY_STEPS[:-1])))
+    trace = [["input", kc_value, non_kc_value, sales_value, redemption_percent]]
 
-    if motivation_result.base_salary:
-        prev = subtotal
-        subtotal += motivation_result.base_salary
-        steps.append(
-            f"Базовая часть мотивации: фиксированная сумма {_fmt_money(motivation_result.base_salary)} руб. Сумма была {prev:.2f} руб., стала {subtotal:.2f} руб."
-        )
+    def step(code, *operands):
+        trace.append([code, *operands, before[code], stages[code]])
 
+    if motivation_result.base_salary:
+        step("base_salary", motivation_result.base_salary)
     sales_percent_value = (motivation_result.sales_component / sales_value * 100.0) if sales_value else 0.0
     if motivation_result.sales_component:
-        prev = subtotal
-        subtotal += motivation_result.sales_component
-        steps.append(
-            "Процент с продаж: база {base} руб., ставка {percent:.2f}%. Формула: {base} × {percent:.2f}% = {delta} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб.".format(
-                base=_fmt_money(sales_value),
-                percent=sales_percent_value,
-                delta=_fmt_money(motivation_result.sales_component),
-                prev=prev,
-                after=subtotal,
-            )
-        )
-
-    redemption_component_value = motivation_result.redemption_component if include_redemption_percent else 0.0
+        step("sales_percent", sales_value, sales_percent_value, motivation_result.sales_component)
+    redemption_component_value = stages["redemption_component"]
     if redemption_component_value:
-        prev = subtotal
-        subtotal += redemption_component_value
-        steps.append(
-            "Процент с выкупа: база {base} руб., ставка {percent:.2f}%. Формула: {base} × {percent:.2f}% = {delta} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб.".format(
-                base=_fmt_money(kc_value),
-                percent=motivation_result.kc_percent,
-                delta=_fmt_money(redemption_component_value),
-                prev=prev,
-                after=subtotal,
-            )
-        )
+        step("redemption_percent", kc_value, motivation_result.kc_percent, redemption_component_value)
     elif motivation_result.redemption_component:
-        steps.append("Процент с выкупа отключен для расчета")
-
+        trace.append(["redemption_disabled"])
     if motivation_result.fixed_bonuses:
-        prev = subtotal
-        subtotal += motivation_result.fixed_bonuses
-        steps.append(
-            f"Фиксированные бонусы мотивации: +{_fmt_money(motivation_result.fixed_bonuses)} руб. Сумма была {prev:.2f} руб., стала {subtotal:.2f} руб."
-        )
-
-    manual_bonus = float(additional_bonus or 0)
-    manual_penalty = float(penalty_amount or 0)
+        step("config_bonuses", motivation_result.fixed_bonuses)
     if manual_bonus:
-        prev = subtotal
-        subtotal += manual_bonus
-        steps.append(
-            f"Ручной фиксированный бонус: +{_fmt_money(manual_bonus)} руб. Сумма была {prev:.2f} руб., стала {subtotal:.2f} руб."
-        )
+        step("manual_bonus", manual_bonus)
     if manual_penalty:
-        prev = subtotal
-        subtotal -= manual_penalty
-        steps.append(
-            f"Штраф: -{_fmt_money(manual_penalty)} руб. Сумма была {prev:.2f} руб., стала {subtotal:.2f} руб."
-        )
-
+        step("penalty", manual_penalty)
     if motivation_result.plan_multiplier != 1:
-        prev = subtotal
-        subtotal *= motivation_result.plan_multiplier
-        steps.append(
-            f"Множитель выполнения плана ({motivation_result.plan_multiplier:.2f}): {prev:.2f} руб. → {subtotal:.2f} руб. (план {motivation_result.plan_target:.2f}, выполнение {(motivation_result.plan_completion * 100):.1f}% )"
-        )
+        step("plan_multiplier", motivation_result.plan_multiplier)
+        trace[-1] += [motivation_result.plan_target, motivation_result.plan_completion]
 
     config_percent_bonus = motivation_result.percentage_bonus_value
-    percent_bonus_amount = subtotal * (config_percent_bonus / 100.0)
+    percent_bonus_amount = stages["percent_bonus_amount"]
     if percent_bonus_amount:
-        prev = subtotal
-        subtotal += percent_bonus_amount
-        steps.append(
-            "Процентный бонус мотивации: база {base} руб., ставка {percent:.2f}%. Формула: {base} × {percent:.2f}% = {delta} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб.".format(
-                base=_fmt_money(prev),
-                percent=config_percent_bonus,
-                delta=_fmt_money(percent_bonus_amount),
-                prev=prev,
-                after=subtotal,
-            )
-        )
+        step("percent_bonus", before["percent_bonus"], config_percent_bonus, percent_bonus_amount)
 
-    bonus_from_salary = subtotal * (float(bonus_percent_salary or 0) / 100.0)
-    bonus_from_sales = sales_value * (float(bonus_percent_sales or 0) / 100.0)
+    bonus_from_salary = stages["bonus_from_salary"]
+    bonus_from_sales = stages["bonus_from_sales"]
     if bonus_from_salary or bonus_from_sales:
-        prev = subtotal
-        subtotal += bonus_from_salary + bonus_from_sales
-        details = []
-        if bonus_from_salary:
-            details.append(
-                "от расчета: {base} × {percent:.2f}% = {delta} руб.".format(
-                    base=_fmt_money(prev),
-                    percent=float(bonus_percent_salary or 0),
-                    delta=_fmt_money(bonus_from_salary),
-                )
-            )
-        if bonus_from_sales:
-            details.append(
-                "от продаж: {base} × {percent:.2f}% = {delta} руб.".format(
-                    base=_fmt_money(sales_value),
-                    percent=float(bonus_percent_sales or 0),
-                    delta=_fmt_money(bonus_from_sales),
-                )
-            )
-        steps.append(
-            f"Дополнительные бонусы ({'; '.join(details)}). Сумма была {prev:.2f} руб., стала {subtotal:.2f} руб."
+        step(
+            "extra_bonuses", before["extra_bonuses"], bonus_salary_percent, bonus_from_salary,
+            sales_value, bonus_sales_percent, bonus_from_sales,
         )
 
-    tax_bonus_percent = float(operator["tax_bonus"] or 0)
-    tax_bonus = subtotal * (tax_bonus_percent / 100.0) if tax_bonus_percent > 0 else 0
-    total_salary = subtotal + tax_bonus
+    subtotal = stages["extra_bonuses"]
+    tax_bonus = stages["tax_bonus"]
+    total_salary = stages["total"]
     if tax_bonus:
-        pre_tax = subtotal
-        steps.append(
-            "Надбавка оператора за налог: база {base} руб., ставка {percent:.2f}%. Формула: {base} × {percent:.2f}% = {delta} руб. Сумма была {prev:.2f} руб., стала {after:.2f} руб.".format(
-                base=_fmt_money(pre_tax),
-                percent=tax_bonus_percent,
-                delta=_fmt_money(tax_bonus),
-                prev=pre_tax,
-                after=total_salary,
-            )
-        )
+        trace.append(["tax_bonus", subtotal, tax_bonus_percent, tax_bonus, subtotal, total_salary])
 
-    steps.append(f"Итоговая выплата: {_fmt_money(total_salary)} руб.")
+    trace.append(["total", total_salary])
 
     breakdown = {
         "kc_salary": motivation_result.redemption_component,
@@ -222,7 +269,7 @@ def _calculate_components(
         "tax_bonus": tax_bonus,
         "plan_target": motivation_result.plan_target,
         "plan_completion": motivation_result.plan_completion,
-        "detailed_steps": steps,
+        "trace": trace,
     }
 
     return {
@@ -243,7 +290,7 @@ def _calculate_components(
         "plan_completion": motivation_result.plan_completion,
         "applied_motivation_name": applied_motivation_name,
         "applied_motivation_config": config,
-        "detailed_breakdown": steps,
+        "breakdown_trace": trace,
         "include_redemption_percent": 1 if include_redemption_percent else 0,
     }, breakdown
 
@@ -267,7 +314,6 @@ def calculate_salary(
     include_redemption_percent=True,
 ):
     conn = get_db_connection()
-    ensure_calculation_columns(conn)
 
     operator = conn.execute(
         """
@@ -327,7 +373,7 @@ def calculate_salary(
              period_start, period_end, additional_bonus, penalty_amount, comment,
              redemption_percent, manual_fixed_bonus, manual_penalty, bonus_percent_salary,
              bonus_percent_sales, applied_motivation_id, applied_motivation_name,
-             motivation_snapshot, calculation_breakdown, working_days_in_period,
+             motivation_version_id, calculation_breakdown, working_days_in_period,
              plan_target, plan_completion, include_redemption_percent, correction_date)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
@@ -350,7 +396,7 @@ def calculate_salary(
                 bonus_percent_sales,
                 target_motivation_id,
                 calc_result["applied_motivation"],
-                json.dumps(calc_result["applied_motivation_config"]),
+                store_motivation_version(conn, calc_result["applied_motivation_config"]),
                 json.dumps(breakdown),
                 working_days_in_period,
                 calc_result["plan_target"],
@@ -379,45 +425,266 @@ def calculate_salary(
     return calc_result
 
 
-def get_calculations_with_filters(operator_id=None, start_date=None, end_date=None, limit=None):
+# =========================
+# BATCH
+# =========================
+
+_CALCULATION_INSERT_COLUMNS = (
+    "id", "operator_id", "kc_amount", "non_kc_amount", "kc_percent", "sales_amount", "total_salary",
+    "period_start", "period_end", "additional_bonus", "penalty_amount", "comment",
+    "redemption_percent", "manual_fixed_bonus", "manual_penalty", "bonus_percent_salary",
+    "bonus_percent_sales", "applied_motivation_id", "applied_motivation_name",
+    "motivation_version_id", "calculation_breakdown", "working_days_in_period",
+    "plan_target", "plan_completion", "include_redemption_percent", "calculation_date", "correction_date",
+)
+
+
+def _reserve_ids(conn, table, count):
+    """First id of a block of `count` fresh ids; call inside a write transaction."""
+    row = conn.execute(
+        f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), COALESCE(MAX(id), 0)) FROM {table}",
+        (table,),
+    ).fetchone()
+    return row[0] + 1
+
+
+def _fetch_by_ids(conn, query, ids):
+    ids = sorted(ids)
+    rows = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        for row in conn.execute(query.format(placeholders=placeholders), chunk).fetchall():
+            rows[row["id"]] = row
+    return rows
+
+
+def _item_id(value):
+    return None if value is None else int(value)
+
+
+def calculate_salary_batch(items, save_to_db=True):
+    """Compute (and optionally save) many calculations in one transaction.
+
+    `items` are dicts shaped like the /api/calculate payload. Operators and
+    motivations are loaded with one query each, calculation and payment rows
+    are written with executemany and committed once. Returns one entry per
+    item, either the calculation result or {"error": ...}; invalid items do
+    not stop the rest of the batch.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    seen_operators = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get("operator_id") is None:
+            results[index] = {"index": index, "error": "operator_id is required"}
+            continue
+        try:
+            operator_id = _item_id(item["operator_id"])
+            override_id = _item_id(item.get("motivation_override_id"))
+        except (TypeError, ValueError):
+            results[index] = {"index": index, "error": "operator_id and motivation_override_id must be integers"}
+            continue
+        if operator_id in seen_operators:
+            results[index] = {"index": index, "error": "duplicate operator_id in batch"}
+            continue
+        seen_operators.add(operator_id)
+        items[index] = dict(item, operator_id=operator_id, motivation_override_id=override_id)
+
+    conn = get_db_connection()
+    operators = _fetch_by_ids(
+        conn, "SELECT id, name, tax_bonus, motivation_id FROM operators WHERE id IN ({placeholders}) AND is_deleted = 0",
+        seen_operators,
+    )
+    motivation_ids = {
+        item.get("motivation_override_id") or operators[item["operator_id"]]["motivation_id"]
+        for index, item in enumerate(items)
+        if results[index] is None and item["operator_id"] in operators
+    }
+    motivation_ids.discard(None)
+    motivations = _fetch_by_ids(conn, "SELECT * FROM motivations WHERE id IN ({placeholders})", motivation_ids)
+
+    computed = []
+    for index, item in enumerate(items):
+        if results[index] is not None:
+            continue
+        operator = operators.get(item["operator_id"])
+        if operator is None:
+            results[index] = {"index": index, "error": "operator not found"}
+            continue
+        target_motivation_id = item.get("motivation_override_id") or operator["motivation_id"]
+        include_redemption_percent = item.get("include_redemption_percent", True)
+        try:
+            calc_result, breakdown = _calculate_components(
+                operator,
+                motivations.get(target_motivation_id),
+                item.get("kc_amount"),
+                item.get("non_kc_amount"),
+                item.get("sales_amount"),
+                item.get("redemption_percent"),
+                item.get("working_days_in_period", 0),
+                item.get("additional_bonus", 0),
+                item.get("penalty_amount", 0),
+                item.get("bonus_percent_salary", 0),
+                item.get("bonus_percent_sales", 0),
+                include_redemption_percent,
+            )
+        except (TypeError, ValueError) as exc:
+            results[index] = {"index": index, "error": str(exc)}
+            continue
+        calc_result["index"] = index
+        calc_result["calculation_id"] = None
+        results[index] = calc_result
+        computed.append((item, target_motivation_id, include_redemption_percent, calc_result, breakdown))
+
+    if not save_to_db or not computed:
+        conn.close()
+        return results
+
+    calculation_date = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    correction_date = datetime.now().strftime("%Y-%m-%d")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        first_calc_id = _reserve_ids(conn, "manual_calculations", len(computed))
+        first_payment_id = _reserve_ids(conn, "payments", len(computed))
+        version_ids = {}
+        calc_rows = []
+        payment_rows = []
+        for offset, (item, target_motivation_id, include_flag, calc_result, breakdown) in enumerate(computed):
+            config_key = json.dumps(calc_result["applied_motivation_config"], sort_keys=True)
+            if config_key not in version_ids:
+                version_ids[config_key] = store_motivation_version(conn, calc_result["applied_motivation_config"])
+            calc_id = first_calc_id + offset
+            calc_rows.append((
+                calc_id,
+                item["operator_id"],
+                calc_result["derived_kc"],
+                calc_result["derived_non_kc"],
+                calc_result["kc_percent"],
+                calc_result["derived_sales"],
+                calc_result["total_salary"],
+                item.get("period_start"),
+                item.get("period_end"),
+                calc_result["additional_bonus"],
+                calc_result["penalty_amount"],
+                item.get("comment"),
+                calc_result["redemption_percent"],
+                calc_result["additional_bonus"],
+                calc_result["penalty_amount"],
+                item.get("bonus_percent_salary", 0),
+                item.get("bonus_percent_sales", 0),
+                target_motivation_id,
+                calc_result["applied_motivation"],
+                version_ids[config_key],
+                json.dumps(breakdown),
+                item.get("working_days_in_period", 0),
+                calc_result["plan_target"],
+                calc_result["plan_completion"],
+                1 if include_flag else 0,
+                calculation_date,
+                correction_date,
+            ))
+            payment_rows.append((
+                first_payment_id + offset,
+                item["operator_id"],
+                calculation_date,
+                calc_result["total_salary"],
+                item.get("period_start"),
+                item.get("period_end"),
+                calc_result["derived_sales"],
+                calc_id,
+                correction_date,
+            ))
+            calc_result.update(
+                calculation_id=calc_id,
+                payment_id=first_payment_id + offset,
+                calculation_date=calculation_date,
+                correction_date=correction_date,
+            )
+
+        conn.executemany(
+            f"INSERT INTO manual_calculations ({', '.join(_CALCULATION_INSERT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _CALCULATION_INSERT_COLUMNS)})",
+            calc_rows,
+        )
+        conn.executemany(
+            """
+            INSERT INTO payments
+            (id, operator_id, calculation_date, total_salary, is_paid,
+             period_start, period_end, sales_amount, calculation_id, correction_date)
+            VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+            """,
+            payment_rows,
+        )
+        # The ids are fresh, so uq_payments_calculation should never skip one;
+        # if it does, say so for that item rather than report a payment the
+        # calculation does not have.
+        inserted = {
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM payments WHERE id BETWEEN ? AND ?",
+                (first_payment_id, first_payment_id + len(payment_rows) - 1),
+            )
+        }
+        for _, _, _, calc_result, _ in computed:
+            if calc_result["payment_id"] not in inserted:
+                calc_result["payment_id"] = None
+                calc_result["error"] = "payment not created: the calculation already has a live payment"
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for item, _, _, calc_result, _ in computed:
+        log_action("calculation_created", f"calc for operator {item['operator_id']}", item["operator_id"])
+        if calc_result["payment_id"] is not None:
+            log_action("payment_created", f"Payment created: {calc_result['total_salary']}", item["operator_id"])
+    return results
+
+
+def get_calculations_with_filters(
+    operator_id=None, start_date=None, end_date=None, limit=None, cursor=None, fields=None, include=()
+):
+    """Calculations newest first, one keyset page at a time.
+
+    `cursor` comes from pagination.next_cursor for the previous page and
+    `fields` is a comma-separated projection (heavy columns are left out
+    unless named or listed in `include`, see pagination.select_columns).
+    """
     conn = get_db_connection()
-    ensure_calculation_columns(conn)
+    columns, selected = select_columns(
+        conn, "manual_calculations", "mc", fields, extra=("operator_name",), include=include
+    )
+    if "operator_name" in selected:
+        columns += ", o.name AS operator_name"
+    if "motivation_snapshot" in selected and "motivation_version_id" not in selected:
+        columns += ", mc.motivation_version_id"
 
-    query = """
-        SELECT mc.*, o.name as operator_name
+    query = f"""
+        SELECT {columns}
         FROM manual_calculations mc
         LEFT JOIN operators o ON mc.operator_id = o.id
-        WHERE 1=1
+        WHERE mc.is_deleted = 0
     """
     params = []
 
-    try:
-        conn.execute("SELECT is_deleted FROM manual_calculations LIMIT 1").fetchone()
-        query += " AND mc.is_deleted = 0"
-    except Exception:
-        pass
-
     if operator_id:
         query += " AND mc.operator_id = ?"
         params.append(operator_id)
 
-    if start_date:
-        query += " AND mc.calculation_date >= ?"
-        params.append(start_date)
-
-    if end_date:
-        query += " AND mc.calculation_date <= ?"
-        params.append(end_date)
-    query += " ORDER BY mc.calculation_date DESC"
-
-    if limit:
-        query += " LIMIT ?"
-        params.append(limit)
+    condition, day_params = day_filter("mc.calculation_day", start_date, end_date)
+    query += condition
+    params.extend(day_params)
 
-    rows = conn.execute(query, params).fetchall()
+    rows = [dict(r) for r in keyset_page(conn, query, params, "mc", cursor, limit)]
+    if "motivation_snapshot" in selected:
+        resolve_motivation_snapshots(conn, rows)
     conn.close()
 
-    return [dict(r) for r in rows]
+    return rows
 
 
 def update_calculation(
@@ -440,7 +707,6 @@ def update_calculation(
     from_correction=False,
 ):
     conn = get_db_connection()
-    ensure_calculation_columns(conn)
 
     existing = conn.execute(
         "SELECT * FROM manual_calculations WHERE id = ?", (calculation_id,)
@@ -507,7 +773,7 @@ def update_calculation(
             period_start = ?, period_end = ?, additional_bonus = ?, penalty_amount = ?, comment = ?,
             redemption_percent = ?, manual_fixed_bonus = ?, manual_penalty = ?, bonus_percent_salary = ?,
             bonus_percent_sales = ?, applied_motivation_id = ?, applied_motivation_name = ?,
-            motivation_snapshot = ?, calculation_breakdown = ?, working_days_in_period = ?, plan_target = ?, plan_completion = ?,
+            motivation_version_id = ?, calculation_breakdown = ?, working_days_in_period = ?, plan_target = ?, plan_completion = ?,
             include_redemption_percent = ?, correction_date = ?
         WHERE id = ?
         """,
@@ -530,7 +796,7 @@ def update_calculation(
             bonus_percent_sales,
             target_motivation_id,
             calc_result["applied_motivation"],
-            json.dumps(calc_result["applied_motivation_config"]),
+            store_motivation_version(conn, calc_result["applied_motivation_config"]),
             json.dumps(breakdown),
             working_days_in_period,
             calc_result["plan_target"],
@@ -541,17 +807,9 @@ def update_calculation(
         ),
     )
 
-    payment_row = conn.execute(
-        """
-        SELECT id FROM payments
-        WHERE is_deleted = 0 AND (calculation_id = ? OR (operator_id = ? AND calculation_date = ?))
-        ORDER BY CASE WHEN calculation_id = ? THEN 0 ELSE 1 END
-        LIMIT 1
-        """,
-        (calculation_id, existing["operator_id"], existing["calculation_date"], calculation_id),
-    ).fetchone()
+    payment_id = find_live_payment(conn, existing["operator_id"], existing["calculation_date"], calculation_id)
 
-    if payment_row:
+    if payment_id:
         conn.execute(
             """
             UPDATE payments
@@ -567,7 +825,7 @@ def update_calculation(
                 calculation_id,
                 1 if from_correction else 0,
                 datetime.now().strftime("%Y-%m-%d") if from_correction else None,
-                payment_row["id"],
+                payment_id,
             ),
         )
     else:
@@ -576,6 +834,7 @@ def update_calculation(
             INSERT INTO payments
             (operator_id, calculation_date, total_salary, is_paid, period_start, period_end, sales_amount, calculation_id, correction_date)
             VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
             """,
             (
                 operator_id,
@@ -0,0 +1,47 @@
+import json
+import random
+import sys
+
+from backtest import HISTORY_COLUMNS, _history_query, _read_only_connection, _simulate_scalar, _simulate_vectorized
+from check_motivation_batch import random_config
+from motivation_engine import MotivationEngine
+
+
+def _history(conn):
+    query, params = _history_query(None, None, None)
+    rows = [tuple(row) for row in conn.execute(query, params).fetchall()]
+    return dict(zip(HISTORY_COLUMNS, zip(*rows))) if rows else None
+
+
+def check(seed=2024, random_configs=200):
+    """Replay every stored calculation through both backtest paths, for every saved and some random configs."""
+    conn = _read_only_connection()
+    try:
+        columns = _history(conn)
+        tax_bonuses = {row["id"]: row["tax_bonus"] or 0 for row in conn.execute("SELECT id, tax_bonus FROM operators")}
+        configs = [(row["id"], row["config_json"]) for row in conn.execute("SELECT id, config_json FROM motivations")]
+    finally:
+        conn.close()
+    if columns is None:
+        print("manual_calculations is empty; nothing to replay")
+        return 0
+
+    rnd = random.Random(seed)
+    configs += [(None, json.dumps(random_config(rnd))) for _ in range(random_configs)]
+    mismatches = 0
+    for motivation_id, config_json in configs:
+        motivation = {"id": motivation_id, "name": "check", "config_json": config_json, "is_deleted": 0, "is_active": 1}
+        plan = MotivationEngine.get_plan(motivation_id, config_json)
+        scalar = _simulate_scalar(columns, motivation, tax_bonuses)
+        vectorized = _simulate_vectorized(columns, plan, tax_bonuses)
+        for calc_id, expected, actual in zip(columns["id"], scalar, vectorized):
+            if expected != actual:
+                mismatches += 1
+                print(f"calculation {calc_id}: scalar={expected!r} vectorized={actual!r} config={config_json}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    failures = check()
+    print("✅ vectorized backtest matches the scalar pipeline" if not failures else f"❌ mismatches: {failures}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,66 @@
+import http.client
+import sys
+import threading
+
+from waitress.server import create_server
+
+import events
+from app import app
+
+THREADS = 2
+TIMEOUT = 5
+
+
+def _get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=TIMEOUT)
+    conn.request("GET", path)
+    return conn, conn.getresponse()
+
+
+def check():
+    """Fill the event stream slots of a small waitress server and check that normal requests still get through."""
+    events.hub.limit_streams(THREADS)
+    server = create_server(app, host="127.0.0.1", port=0, threads=THREADS)
+    port = server.effective_port
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    failures = []
+    streams = []
+    try:
+        for _ in range(events.hub.max_streams):
+            conn, response = _get(port, "/api/events")
+            streams.append(conn)
+            if response.status != 200:
+                failures.append(f"stream within the limit got {response.status}")
+            response.readline()
+
+        conn, response = _get(port, "/api/events")
+        response.read()
+        conn.close()
+        if response.status != 503 or not response.getheader("Retry-After"):
+            failures.append(f"stream over the limit got {response.status}, Retry-After={response.getheader('Retry-After')}")
+
+        try:
+            conn, response = _get(port, "/api/operators")
+            response.read()
+            conn.close()
+            if response.status != 200:
+                failures.append(f"/api/operators got {response.status} with the stream slots full")
+        except OSError as exc:
+            failures.append(f"/api/operators did not answer with the stream slots full: {exc}")
+    finally:
+        events.hub.stop()
+        for conn in streams:
+            conn.close()
+        server.task_dispatcher.shutdown()
+        server.close()
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check()
+    for failure in failures:
+        print(failure)
+    print("✅ normal requests are served while the event streams are at their limit" if not failures
+          else f"❌ failures: {len(failures)}")
+    sys.exit(1 if failures else 0)
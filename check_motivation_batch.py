@@ -0,0 +1,87 @@
+import random
+import sys
+from dataclasses import asdict
+
+import numpy as np
+
+from motivation_batch import RESULT_FIELDS, derive_amounts_batch, evaluate_batch
+from motivation_engine import MotivationEngine, derive_amounts
+
+BLOCK_TYPES = [
+    "fixed_salary", "percent_sales", "percent_redeemed", "progressive_redemption",
+    "fixed_bonus", "percentage_bonus", "sales_plan", "unknown",
+]
+BOUNDARIES = [0, 40, 47.9, 48, 50, 52.9, 53, 59.9, 60, 70, 100]
+
+
+def random_config(rnd):
+    blocks = []
+    for _ in range(rnd.randint(0, 6)):
+        block = {
+            "type": rnd.choice(BLOCK_TYPES),
+            "apply_mode": rnd.choice(["together", "one_of", None]),
+            "monthly_amount": rnd.choice([0, 30000, 50000]),
+            "percent": rnd.choice([0, 2.5, 5, 10, None]),
+            "amount": rnd.choice([0, 500, 1000]),
+            "plan_value": rnd.choice([0, 175000, 500000]),
+            "plan_period": rnd.choice(["weekly", "monthly", None]),
+        }
+        if block["type"] == "progressive_redemption":
+            block["ranges"] = []
+            for _ in range(rnd.randint(0, 5)):
+                start = rnd.choice(BOUNDARIES)
+                block["ranges"].append({
+                    "from": start,
+                    "to": rnd.choice([None, start, start + 4.9, start + 20, start - 3]),
+                    "percent": rnd.choice([0, 2, 6, 10, 14, None]),
+                })
+        blocks.append(block)
+    return {"blocks": blocks}
+
+
+def random_inputs(rnd, size):
+    def pick(values, missing=False):
+        return [rnd.choice(values + ([None] if missing else [])) for _ in range(size)]
+
+    return (
+        pick([0, 1000, 55555.5, 100000], missing=True),
+        pick([0, 20000, 80000.25], missing=True),
+        pick([0, 180000, 200000, 1e6], missing=True),
+        pick([0, 33.3, 47.9, 48, 50, 53, 59.9, 59.95, 60, 70, 100], missing=True),
+        pick([0, 3.5, 5, 20, -1]),
+    )
+
+
+def as_column(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def check(seed=2024, configs=500, rows=200):
+    rnd = random.Random(seed)
+    mismatches = 0
+    for _ in range(configs):
+        plan = MotivationEngine.compile(random_config(rnd))
+        kc, non_kc, sales, redemption, days = random_inputs(rnd, rows)
+
+        batch_derived = derive_amounts_batch(as_column(kc), as_column(non_kc), as_column(sales), as_column(redemption))
+        scalar_derived = [derive_amounts(*args) for args in zip(kc, non_kc, sales, redemption)]
+        for position, name in enumerate(("kc", "non_kc", "sales", "redemption")):
+            expected = np.array([row[position] for row in scalar_derived])
+            if not np.array_equal(batch_derived[position], expected):
+                mismatches += 1
+                print(f"derive_amounts mismatch in {name}")
+
+        batch = evaluate_batch(plan, batch_derived[0], batch_derived[2], batch_derived[3], days)
+        for i, row in enumerate(scalar_derived):
+            expected = asdict(MotivationEngine.evaluate(plan, row[0], row[2], row[3], days[i]))
+            for name in RESULT_FIELDS:
+                if batch[name][i] != expected[name]:
+                    mismatches += 1
+                    print(f"{name} mismatch: batch={batch[name][i]!r} scalar={expected[name]!r} plan={plan}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    failures = check()
+    print("✅ batch engine matches scalar engine" if not failures else f"❌ mismatches: {failures}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,104 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+# Writes calculations and payments, so work on a copy of operators.db.
+_workdir = tempfile.mkdtemp(prefix="check_payments-")
+shutil.copy("operators.db", _workdir)
+os.chdir(_workdir)
+
+import config  # noqa: E402
+from app import app  # noqa: E402
+from payments import create_payment  # noqa: E402
+
+
+def _operator(conn):
+    row = conn.execute(
+        "SELECT id FROM operators WHERE is_deleted = 0 AND motivation_id IS NOT NULL ORDER BY id LIMIT 1"
+    ).fetchone()
+    return row["id"] if row else None
+
+
+def _own_payment(conn, result):
+    row = conn.execute(
+        "SELECT calculation_id FROM payments WHERE id = ? AND is_deleted = 0", (result.get("payment_id"),)
+    ).fetchone()
+    return row is not None and row["calculation_id"] == result["calculation_id"]
+
+
+def check_same_second_calculations(client, operator_id):
+    """A single and a batch calculation for one operator in the same second each get their own payment."""
+    body = {
+        "operator_id": operator_id, "kc_amount": 60000, "non_kc_amount": 40000, "sales_amount": 100000, "save": True,
+    }
+    for _ in range(5):
+        second = datetime.now(timezone.utc).replace(microsecond=0)
+        single = client.post("/api/calculate", json=body).get_json()
+        batch = client.post("/api/calculate/batch", json={"items": [body]}).get_json()["results"][0]
+        if second == datetime.now(timezone.utc).replace(microsecond=0):
+            break
+    else:
+        return ["could not run both calculations within one second"]
+    if single["calculation_date"] != batch.get("calculation_date"):
+        return [f"calculation dates differ: {single['calculation_date']} / {batch.get('calculation_date')}"]
+
+    failures = []
+    conn = config.get_db_connection()
+    for name, result in (("/api/calculate", single), ("/api/calculate/batch", batch)):
+        if "error" in result:
+            failures.append(f"{name}: {result['error']}")
+        elif name == "/api/calculate/batch" and not _own_payment(conn, result):
+            failures.append(f"{name}: calculation {result['calculation_id']} got payment {result.get('payment_id')}")
+    count = conn.execute(
+        "SELECT COUNT(*) FROM payments WHERE calculation_id IN (?, ?) AND is_deleted = 0",
+        (single["calculation_id"], batch.get("calculation_id")),
+    ).fetchone()[0]
+    if count != 2:
+        failures.append(f"expected one payment per calculation, found {count} for both")
+    conn.close()
+    return failures
+
+
+def check_create_payment_in_transaction(operator_id):
+    """create_payment without a calculation joins a transaction the caller already has open."""
+    conn = config.get_db_connection()
+    conn.execute("UPDATE operators SET name = name WHERE id = ?", (operator_id,))
+    try:
+        first = create_payment(operator_id, "2031-01-01", 100)
+    except sqlite3.OperationalError as exc:
+        conn.rollback()
+        return [f"create_payment inside an open transaction: {exc}"]
+    second = create_payment(operator_id, "2031-01-01", 100)
+    if first != second:
+        return [f"create_payment without a calculation was not deduplicated: {first} / {second}"]
+    return []
+
+
+def check():
+    client = app.test_client()
+    with app.app_context():
+        operator_id = _operator(config.get_db_connection())
+    if operator_id is None:
+        print("no live operator with a motivation; nothing to check")
+        return []
+    failures = check_same_second_calculations(client, operator_id)
+    with app.app_context():
+        failures += check_create_payment_in_transaction(operator_id)
+    return failures
+
+
+if __name__ == "__main__":
+    try:
+        failures = check()
+    finally:
+        config.shutdown_action_log()
+        config.close_all_connections()
+        os.chdir(os.path.dirname(_workdir))
+        shutil.rmtree(_workdir, ignore_errors=True)
+    for failure in failures:
+        print(failure)
+    print("✅ payments are created once and belong to their own calculations" if not failures else f"❌ failures: {len(failures)}")
+    sys.exit(1 if failures else 0)
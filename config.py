@@ -1,6 +1,14 @@
-﻿import sqlite3
+﻿import queue
+import sqlite3
+import threading
+import time
 from datetime import datetime
 
+from flask import g, has_app_context
+
+from audit_log import get_writer
+import slow_queries
+from metrics import record_query
 from schema_manager import ensure_schema
 
 DB_PATH = 'operators.db'
@@ -8,19 +16,196 @@ DB_PATH = 'operators.db'
 ensure_schema()
 
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+# =========================
+# CONNECTION MANAGER
+# =========================
+
+# PRAGMAs applied once per physical connection. WAL lets readers run alongside
+# a writer, busy_timeout makes writers queue instead of failing with
+# "database is locked".
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -16000),
+    ('mmap_size', 268435456),
+    ('temp_store', 'MEMORY'),
+)
+STATEMENT_CACHE_SIZE = 256
+POOL_SIZE = 8
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+_local = threading.local()
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor that reports fetched rows and fetch time to metrics.
+
+    While the slow-query log is on, it also accumulates execute + fetch time
+    for its statement and hands the statement to slow_queries once it
+    reaches the threshold.
+    """
+
+    _statement = None  # (sql, parameters, seconds so far), only while slow_queries is on
+
+    def _track(self, seconds):
+        sql, parameters, total = self._statement
+        total += seconds
+        threshold = slow_queries.threshold
+        if threshold is not None and total >= threshold:
+            self._statement = None
+            slow_queries.record(self.connection, sql, parameters, total)
+        else:
+            self._statement = (sql, parameters, total)
+
+    def _fetched(self, started, rows):
+        seconds = time.perf_counter() - started
+        record_query(seconds, statements=0, rows=rows)
+        if self._statement is not None:
+            self._track(seconds)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, int(row is not None))
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        record_query(0.0, statements=0, rows=1)
+        return row
+
+
+class ManagedConnection(sqlite3.Connection):
+    """Connection shared by every call made within one request or thread.
+
+    close() only ends the caller's unit of work: uncommitted changes are rolled
+    back (as a real close would do) but the connection stays open until
+    release_db_connection() hands it back to the pool. Statements run through
+    execute()/executemany() are counted for /api/metrics and checked against
+    the slow-query log threshold.
+    """
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        cursor = self.cursor()
+        cursor.execute(sql, parameters)
+        seconds = time.perf_counter() - started
+        record_query(seconds)
+        if slow_queries.threshold is not None:
+            cursor._statement = (sql, parameters, 0.0)
+            cursor._track(seconds)
+        return cursor
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        cursor = self.cursor()
+        cursor.executemany(sql, parameters)
+        seconds = time.perf_counter() - started
+        record_query(seconds)
+        threshold = slow_queries.threshold
+        if threshold is not None and seconds >= threshold:
+            slow_queries.record(self, sql, None, seconds, many=True)
+        return cursor
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        super().close()
+
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_PATH,
+        factory=ManagedConnection,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
     conn.row_factory = sqlite3.Row
+    for name, value in CONNECTION_PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def _acquire_connection():
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return _open_connection()
+
+
+def _get_scope():
+    if has_app_context():
+        return g
+    return _local
+
+
+def get_db_connection():
+    scope = _get_scope()
+    conn = getattr(scope, '_db_connection', None)
+    if conn is None:
+        conn = _acquire_connection()
+        scope._db_connection = conn
     return conn
 
+
+def release_db_connection(exc=None):
+    """Return the current request/thread connection to the pool."""
+    scope = _get_scope()
+    conn = getattr(scope, '_db_connection', None)
+    if conn is None:
+        return
+    scope._db_connection = None
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put_nowait(conn)
+    except (queue.Full, sqlite3.Error):
+        conn.dispose()
+
+
+def close_all_connections():
+    """Dispose of pooled connections (shutdown, or after fork)."""
+    release_db_connection()
+    while True:
+        try:
+            _pool.get_nowait().dispose()
+        except queue.Empty:
+            break
+
+
+# =========================
+# AUDIT LOG
+# =========================
+
 def log_action(action_type, details=None, operator_id=None, performed_by='system'):
-    conn = get_db_connection()
-    conn.execute(
-        'INSERT INTO action_log (action_type, action_details, operator_id, performed_by) VALUES (?, ?, ?, ?)',
-        (action_type, details, operator_id, performed_by)
-    )
-    conn.commit()
-    conn.close()
+    """Queue an action_log row; the audit writer group-commits it shortly after."""
+    get_writer(DB_PATH).enqueue(action_type, details, operator_id, performed_by)
+
+
+def flush_action_log(timeout=5.0):
+    return get_writer(DB_PATH).flush(timeout)
+
+
+def shutdown_action_log(timeout=5.0):
+    get_writer(DB_PATH).shutdown(timeout)
 
 def get_system_settings():
     conn = get_db_connection()
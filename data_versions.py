@@ -0,0 +1,25 @@
+"""Trigger-maintained change counters for the main tables.
+
+data_versions holds one monotonic counter per table and the time of its last
+change. Triggers bump it on every insert, update and delete, whichever module,
+script or process makes the change, so a cached response can be revalidated
+by comparing counters instead of re-running its queries. The same triggers
+append a row to change_events (entity, id, operation, version), which
+events.py streams to browsers; a trigger on change_events itself keeps only
+the last 10000 of them. The triggers are created by schema migrations 11-14.
+"""
+
+
+def current_version(conn, tables=None):
+    """(version, last change as a unix timestamp or None) over `tables`.
+
+    The version is the sum of the per-table counters, so it grows whenever any
+    of them changes; tables=None gives the global version over every table.
+    """
+    query = "SELECT COALESCE(SUM(version), 0), MAX(updated_at) FROM data_versions"
+    params = []
+    if tables is not None:
+        query += f" WHERE table_name IN ({', '.join('?' for _ in tables)})"
+        params.extend(tables)
+    version, updated_at = conn.execute(query, params).fetchone()
+    return version, updated_at
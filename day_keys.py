@@ -0,0 +1,68 @@
+"""Integer day keys (days since 1970-01-01) for the date columns.
+
+Dates are stored as text in two shapes: ISO ('2025-10-31', '2025-10-31 07:20:24',
+'2025-10-31T07:20:24') and the legacy DD.MM.YYYY ('31.10.2025'). Both map to the
+same day number in SQL (sql_day) and in Python (to_day); unparseable or missing
+dates become UNKNOWN_DAY in SQL and None in Python.
+"""
+from datetime import date, datetime
+
+UNKNOWN_DAY = -1
+MAX_DAY = 2932896  # 9999-12-31
+
+_EPOCH = date(1970, 1, 1)
+_JULIAN_EPOCH = 2440587.5
+
+
+def sql_day(column):
+    """SQL expression giving the day number of a text date column."""
+    return (
+        f"COALESCE(CAST(julianday(CASE WHEN {column} GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]*' "
+        f"THEN substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) "
+        f"ELSE substr({column}, 1, 10) END) - {_JULIAN_EPOCH} AS INTEGER), {UNKNOWN_DAY})"
+    )
+
+
+def to_day(value):
+    """Day number for a date string/date/datetime, or None if it cannot be parsed."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return (value - _EPOCH).days
+    text = str(value).strip()
+    try:
+        if len(text) >= 10 and text[2] == "." and text[5] == ".":
+            parsed = datetime.strptime(text[:10], "%d.%m.%Y").date()
+        else:
+            parsed = date.fromisoformat(text[:10])
+    except ValueError:
+        return None
+    return (parsed - _EPOCH).days
+
+
+def from_day(day):
+    """ISO date string for a day number."""
+    return date.fromordinal(_EPOCH.toordinal() + day).isoformat()
+
+
+def day_filter(column, start_date=None, end_date=None):
+    """SQL fragment and params restricting integer day `column` to a date range.
+
+    Both bounds are inclusive calendar days; rows with an unknown day are
+    excluded whenever a bound is given. Raises ValueError for unparseable dates.
+    """
+    if not start_date and not end_date:
+        return "", []
+    bounds = []
+    for value in (start_date, end_date):
+        day = to_day(value) if value else None
+        if value and day is None:
+            raise ValueError(f"invalid date: {value}")
+        bounds.append(day)
+    start_day, end_day = bounds
+    return (
+        f" AND {column} BETWEEN ? AND ?",
+        [UNKNOWN_DAY + 1 if start_day is None else start_day, MAX_DAY if end_day is None else end_day],
+    )
@@ -0,0 +1,197 @@
+"""Server-Sent Events feed of the change_events table (GET /api/events).
+
+Every write to operators, motivations, manual_calculations and payments adds a
+change_events row through the data_versions triggers, whichever process made
+it. One EventHub thread per process polls that table (a PRAGMA data_version
+check when nothing changed) and wakes the open streams, which hold no database
+connection of their own.
+
+Streams are bounded: each closes after STREAM_SECONDS and the browser's
+EventSource reconnects with Last-Event-ID, so idle tabs never pin a server
+thread for long. An open stream does occupy a request thread, so under
+serve.py at most STREAM_THREAD_SHARE of a worker's threads serve streams
+(limit_streams) and further ones get a 503; the development server, which
+starts a thread per request, allows MAX_STREAMS. A client that resumes from
+an event that has already been pruned (the table keeps the last 10000)
+gets a `reset` event and reloads everything.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from config import DB_PATH
+
+POLL_INTERVAL = 0.5
+STREAM_SECONDS = 25
+KEEPALIVE_SECONDS = 10
+RETRY_MS = 1000
+MAX_STREAMS = 32
+STREAM_THREAD_SHARE = 0.5
+BUFFER_SIZE = 1000
+
+_EVENT_COLUMNS = "id, entity, entity_id, operation, version"
+
+
+def _event(row):
+    return {"id": row[0], "entity": row[1], "entity_id": row[2], "operation": row[3], "version": row[4]}
+
+
+class EventHub:
+    """Polls change_events and fans new rows out to every open stream."""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._condition = threading.Condition()
+        self._buffer = deque(maxlen=BUFFER_SIZE)
+        self._latest_id = None
+        self._streams = 0
+        self.max_streams = MAX_STREAMS
+        self._thread = None
+        self._stopping = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _read_events(self, conn, after_id):
+        return [
+            _event(row)
+            for row in conn.execute(
+                f"SELECT {_EVENT_COLUMNS} FROM change_events WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, BUFFER_SIZE),
+            ).fetchall()
+        ]
+
+    def limit_streams(self, threads):
+        """Cap open streams at STREAM_THREAD_SHARE of the server's request threads."""
+        self.max_streams = min(MAX_STREAMS, int(threads * STREAM_THREAD_SHARE))
+
+    def open_stream(self):
+        """Register a stream; False when max_streams are already open."""
+        with self._condition:
+            if self._stopping or self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            if self._thread is None:
+                # No poller has been watching since the last stream closed, so
+                # start from the current end of the table; a client resuming
+                # from an older id reads what it missed from the table.
+                conn = self._connect()
+                try:
+                    self._latest_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_events").fetchone()[0]
+                finally:
+                    conn.close()
+                self._buffer.clear()
+                self._thread = threading.Thread(target=self._run, name="event-hub", daemon=True)
+                self._thread.start()
+            return True
+
+    def close_stream(self):
+        with self._condition:
+            self._streams -= 1
+
+    def latest_id(self):
+        with self._condition:
+            return self._latest_id
+
+    def events_after(self, last_id):
+        """Events with id > last_id, oldest first, or None if some were already pruned."""
+        with self._condition:
+            if last_id >= self._latest_id:
+                return []
+            if self._buffer and self._buffer[0]["id"] <= last_id + 1:
+                return [event for event in self._buffer if event["id"] > last_id]
+        conn = self._connect()
+        try:
+            events = self._read_events(conn, last_id)
+        finally:
+            conn.close()
+        if not events or events[0]["id"] != last_id + 1:
+            return None
+        return events
+
+    def wait(self, last_id, timeout):
+        """Block until an event newer than last_id arrives; False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._stopping or self._latest_id > last_id, timeout)
+
+    @property
+    def stopping(self):
+        return self._stopping
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(POLL_INTERVAL * 4)
+
+    def _run(self):
+        conn = self._connect()
+        data_version = None
+        try:
+            while True:
+                with self._condition:
+                    if self._stopping or self._streams <= 0:
+                        # Idle: the next open_stream starts a new poller.
+                        self._thread = None
+                        return
+                    after_id = self._latest_id
+                # data_version changes whenever another connection commits.
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    events = self._read_events(conn, after_id)
+                    if events:
+                        with self._condition:
+                            self._buffer.extend(events)
+                            self._latest_id = events[-1]["id"]
+                            self._condition.notify_all()
+                    if len(events) == BUFFER_SIZE:
+                        data_version = None  # more pending; read again without sleeping
+                        continue
+                time.sleep(POLL_INTERVAL)
+        except sqlite3.Error:
+            with self._condition:
+                self._thread = None
+            raise
+        finally:
+            conn.close()
+
+
+hub = EventHub()
+
+
+def _format(event):
+    data = {
+        "entity": event["entity"],
+        "id": event["entity_id"],
+        "operation": event["operation"],
+        "version": event["version"],
+    }
+    return f"id: {event['id']}\nevent: change\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def stream(event_hub, last_id=None):
+    """SSE body for one client opened with open_stream(); the caller closes it with close_stream()."""
+    yield f"retry: {RETRY_MS}\n\n"
+    if last_id is None:
+        last_id = event_hub.latest_id()
+    deadline = time.monotonic() + STREAM_SECONDS
+    while True:
+        events = event_hub.events_after(last_id)
+        if events is None:
+            last_id = event_hub.latest_id()
+            yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+        elif events:
+            yield "".join(_format(event) for event in events)
+            last_id = events[-1]["id"]
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or event_hub.stopping:
+            return
+        if not event_hub.wait(last_id, min(KEEPALIVE_SECONDS, remaining)):
+            yield ": keepalive\n\n"
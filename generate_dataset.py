@@ -0,0 +1,349 @@
+"""Build a synthetic payroll database for benchmarks.
+
+    python generate_dataset.py --scale medium
+    python generate_dataset.py --operators 500 --calculations 250000 --out bench_data/custom
+
+Writes <out>/operators.db and <out>/dataset.json (the parameters and row
+counts). The same arguments and --seed always give the same rows.
+
+Motivations are drawn from the shapes used in production (fixed salary with a
+sales plan, percent of sales, progressive redemption ranges, fixed bonuses),
+each calculation is computed by the real salary pipeline, so amounts and
+breakdowns look like saved ones, and most calculations have a payment. Small
+fractions of the rows are legacy (DD.MM.YYYY dates, payments without a
+calculation_id) or in the trash.
+
+Rows are loaded into a schema at version LOAD_AT_VERSION and the later
+migrations are applied afterwards: they build the row counts, rollups, day
+columns and triggers from the loaded rows exactly as they would for an
+existing database, without firing a trigger per inserted row.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+
+import schema_manager
+from calculations import _calculate_components
+from motivation_engine import MotivationEngine
+
+SCALES = {
+    "small": {"operators": 100, "calculations": 10000},
+    "medium": {"operators": 1000, "calculations": 100000},
+    "large": {"operators": 10000, "calculations": 1000000},
+    "xlarge": {"operators": 10000, "calculations": 5000000},
+}
+
+LOAD_AT_VERSION = 4  # motivation_versions exists; indexes from migration 5 on are built after the load
+BATCH_SIZE = 5000
+DEFAULT_END_DATE = "2025-12-31"
+TAX_BONUS = 6.0
+
+DELETED_OPERATORS = 0.02
+INACTIVE_OPERATORS = 0.05
+OPERATORS_WITHOUT_MOTIVATION = 0.05
+DELETED_CALCULATIONS = 0.01
+LEGACY_CALCULATIONS = 0.02
+PAYMENT_RATIO = 0.95
+PAID_AFTER_DAYS = 14
+
+CALCULATION_COLUMNS = (
+    "id", "operator_id", "kc_amount", "non_kc_amount", "kc_percent", "sales_amount", "total_salary",
+    "period_start", "period_end", "additional_bonus", "penalty_amount", "redemption_percent",
+    "manual_fixed_bonus", "manual_penalty", "bonus_percent_salary", "bonus_percent_sales",
+    "applied_motivation_id", "applied_motivation_name", "motivation_version_id", "calculation_breakdown",
+    "working_days_in_period", "plan_target", "plan_completion", "include_redemption_percent",
+    "calculation_date", "correction_date", "is_deleted", "deleted_at",
+)
+PAYMENT_COLUMNS = (
+    "id", "operator_id", "calculation_date", "total_salary", "is_paid", "payment_date", "period_start",
+    "period_end", "sales_amount", "additional_bonus", "penalty_amount", "calculation_id", "correction_date",
+    "is_deleted", "deleted_at",
+)
+
+
+def _insert_sql(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+
+def _progressive_ranges(rng, count, start_from_zero):
+    """Consecutive redemption ranges with growing percents, e.g. 48-52.9 -> 6%, 53-59.9 -> 10%."""
+    ranges = []
+    start = 0.0 if start_from_zero else float(rng.randint(40, 55))
+    percent = 0.0 if start_from_zero else float(rng.randint(2, 8))
+    for index in range(count):
+        if index == count - 1:
+            end = 100.0
+        elif start_from_zero and index == 0:
+            end = float(rng.randint(40, 50)) - 0.1
+        else:
+            end = start + rng.randint(4, 10) - 0.1
+        ranges.append({"from": start, "percent": percent, "to": round(end, 1)})
+        start = round(end + 0.1, 1)
+        percent += rng.randint(2, 5)
+    return ranges
+
+
+def _motivation_config(rng, kind):
+    blocks = []
+    if kind == "salary":
+        period = rng.choice(("weekly", "monthly"))
+        blocks.append({
+            "type": "sales_plan", "apply_mode": "together", "plan_period": period,
+            "plan_value": rng.randrange(150000, 250000, 5000) * (1 if period == "weekly" else 4),
+        })
+        blocks.append({"type": "fixed_salary", "apply_mode": "together",
+                       "monthly_amount": rng.randrange(40000, 70000, 5000)})
+        blocks.append({"type": "progressive_redemption", "apply_mode": "together",
+                       "ranges": _progressive_ranges(rng, 1, False)})
+    elif kind == "stars":
+        blocks.append({"type": "percent_sales", "apply_mode": "together", "percent": rng.randint(5, 10)})
+        blocks.append({"type": "progressive_redemption", "apply_mode": "together",
+                       "ranges": _progressive_ranges(rng, 3, False)})
+    elif kind == "progressive":
+        blocks.append({"type": "percent_sales", "apply_mode": "together", "percent": rng.randint(3, 6)})
+        blocks.append({"type": "progressive_redemption", "apply_mode": "together",
+                       "ranges": _progressive_ranges(rng, rng.randint(4, 6), True)})
+    else:  # "best_of": the better of two payouts plus a fixed bonus
+        blocks.append({"type": "percent_redeemed", "apply_mode": "one_of", "percent": rng.randint(8, 14)})
+        blocks.append({"type": "progressive_redemption", "apply_mode": "one_of",
+                       "ranges": _progressive_ranges(rng, 3, False)})
+        blocks.append({"type": "fixed_bonus", "apply_mode": "together", "amount": rng.randrange(1000, 10000, 500)})
+    blocks.append({"type": "percentage_bonus", "apply_mode": "together", "percent": 6})
+    return {"blocks": blocks}
+
+
+MOTIVATION_KINDS = {
+    "salary": "Оклад",
+    "stars": "Звезды",
+    "progressive": "Прогрессивная",
+    "best_of": "Лучшая из двух",
+}
+
+
+def _insert_motivations(conn, rng, count, created_at):
+    """Motivation rows (the last one in the trash) and their content-addressed versions."""
+    motivations = []
+    kinds = list(MOTIVATION_KINDS)
+    for index in range(count):
+        kind = kinds[index % len(kinds)]
+        config = _motivation_config(rng, kind)
+        text, content_hash = MotivationEngine.canonical_config(config)
+        conn.execute(
+            "INSERT OR IGNORE INTO motivation_versions (content_hash, config_json, created_at) VALUES (?, ?, ?)",
+            (content_hash, text, created_at),
+        )
+        version_id = conn.execute(
+            "SELECT id FROM motivation_versions WHERE content_hash = ?", (content_hash,)
+        ).fetchone()[0]
+        deleted = index == count - 1 and count > 1
+        motivation = {
+            "id": index + 1,
+            "name": f"{MOTIVATION_KINDS[kind]} {index // len(kinds) + 1}",
+            "config_json": json.dumps(config, ensure_ascii=False, separators=(",", ":")),
+            "is_active": 1,
+            "is_deleted": 1 if deleted else 0,
+            "version_id": version_id,
+        }
+        conn.execute(
+            """
+            INSERT INTO motivations (id, name, description, motivation_type, config_json, is_active,
+                                     is_deleted, deleted_at, created_at)
+            VALUES (?, ?, NULL, 'composite', ?, 1, ?, ?, ?)
+            """,
+            (motivation["id"], motivation["name"], motivation["config_json"], motivation["is_deleted"],
+             created_at if deleted else None, created_at),
+        )
+        motivations.append(motivation)
+    return motivations
+
+
+def _insert_operators(conn, rng, count, motivations, created_at):
+    live_motivations = [m for m in motivations if not m["is_deleted"]]
+    operators = []
+    rows = []
+    for index in range(count):
+        motivation = None if rng.random() < OPERATORS_WITHOUT_MOTIVATION else rng.choice(live_motivations)
+        operator = {
+            "id": index + 1,
+            "tax_bonus": TAX_BONUS,
+            "motivation": motivation,
+            "is_deleted": 1 if rng.random() < DELETED_OPERATORS else 0,
+        }
+        operators.append(operator)
+        rows.append((
+            operator["id"], f"Оператор {index + 1:05d}", "progressive" if motivation else "fixed", 10.0,
+            TAX_BONUS, 0 if rng.random() < INACTIVE_OPERATORS else 1, operator["is_deleted"],
+            created_at if operator["is_deleted"] else None, motivation["id"] if motivation else None, created_at,
+        ))
+    conn.executemany(
+        """
+        INSERT INTO operators (id, name, salary_type, base_percent, tax_bonus, is_active, is_deleted,
+                               deleted_at, motivation_id, created_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    return operators
+
+
+def _calculation(rng, calc_id, operator, moment, end_date):
+    """One manual_calculations row and, most of the time, its payments row."""
+    weekly = rng.random() < 0.7
+    working_days = 5 if weekly else 20
+    period_end = moment.date()
+    period_start = period_end - timedelta(days=6 if weekly else 29)
+    sales = round(rng.lognormvariate(11.0 if weekly else 12.4, 0.5), 2)
+    redemption = min(max(rng.gauss(55.0, 9.0), 15.0), 95.0)
+    kc = round(sales * redemption / 100.0, 2)
+    additional_bonus = float(rng.randrange(500, 5001, 500)) if rng.random() < 0.1 else 0.0
+    penalty = float(rng.randrange(200, 3001, 100)) if rng.random() < 0.05 else 0.0
+
+    motivation = operator["motivation"]
+    result, breakdown = _calculate_components(
+        operator, motivation, kc, round(sales - kc, 2), sales, None, working_days, additional_bonus, penalty, 0, 0,
+    )
+
+    legacy = rng.random() < LEGACY_CALCULATIONS
+    if legacy:
+        calculation_date = moment.strftime("%d.%m.%Y")
+        correction_date = None
+    else:
+        calculation_date = moment.strftime("%Y-%m-%d %H:%M:%S")
+        correction_date = moment.strftime("%Y-%m-%d")
+    deleted = rng.random() < DELETED_CALCULATIONS
+    deleted_at = (moment + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S") if deleted else None
+
+    calculation = (
+        calc_id, operator["id"], result["derived_kc"], result["derived_non_kc"], result["kc_percent"],
+        result["derived_sales"], result["total_salary"], period_start.isoformat(), period_end.isoformat(),
+        additional_bonus, penalty, result["redemption_percent"], additional_bonus, penalty, 0, 0,
+        motivation["id"] if motivation else None, result["applied_motivation"],
+        motivation["version_id"] if motivation else None, json.dumps(breakdown), working_days,
+        result["plan_target"], result["plan_completion"], 1, calculation_date, correction_date,
+        1 if deleted else 0, deleted_at,
+    )
+    if rng.random() >= PAYMENT_RATIO:
+        return calculation, None
+    paid = (end_date - period_end).days > PAID_AFTER_DAYS
+    payment = (
+        calc_id, operator["id"], calculation_date, result["total_salary"], 1 if paid else 0,
+        (period_end + timedelta(days=7)).isoformat() if paid else None, period_start.isoformat(),
+        period_end.isoformat(), result["derived_sales"], additional_bonus, penalty,
+        None if legacy else calc_id, correction_date, 1 if deleted else 0, deleted_at,
+    )
+    return calculation, payment
+
+
+def _insert_calculations(conn, rng, operators, count, start, end_date):
+    """Calculations spread evenly over [start, end_date]; timestamps strictly increase, so none collide."""
+    end = datetime.combine(end_date, datetime.max.time()).replace(microsecond=0)
+    step = (end - start).total_seconds() / max(count, 1)
+    calculation_sql = _insert_sql("manual_calculations", CALCULATION_COLUMNS)
+    payment_sql = _insert_sql("payments", PAYMENT_COLUMNS)
+    payments = 0
+    previous = -1
+    for first in range(0, count, BATCH_SIZE):
+        calculations_batch = []
+        payments_batch = []
+        for index in range(first, min(first + BATCH_SIZE, count)):
+            offset = max(int(index * step + rng.random() * step * 0.5), previous + 1)
+            previous = offset
+            moment = start + timedelta(seconds=offset)
+            calculation, payment = _calculation(rng, index + 1, rng.choice(operators), moment, end_date)
+            calculations_batch.append(calculation)
+            if payment is not None:
+                payments_batch.append(payment)
+        conn.executemany(calculation_sql, calculations_batch)
+        conn.executemany(payment_sql, payments_batch)
+        payments += len(payments_batch)
+        done = min(first + BATCH_SIZE, count)
+        if done % (BATCH_SIZE * 20) == 0 or done == count:
+            print(f"  {done}/{count} calculations", file=sys.stderr)
+    return payments
+
+
+def _migrate(conn, after, up_to):
+    for version, _description, apply in schema_manager.MIGRATIONS:
+        if after < version <= up_to:
+            apply(conn)
+    conn.execute(f"PRAGMA user_version = {up_to}")
+
+
+def generate(path, operators, calculations, motivations=12, days=365, end_date=DEFAULT_END_DATE, seed=1):
+    """Create a database at `path` (which must not exist); returns the dataset description."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    end = date.fromisoformat(end_date)
+    start = datetime.combine(end - timedelta(days=days - 1), datetime.min.time())
+    created_at = start.strftime("%Y-%m-%d %H:%M:%S")
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        _migrate(conn, 0, LOAD_AT_VERSION)
+        motivation_rows = _insert_motivations(conn, rng, motivations, created_at)
+        operator_rows = _insert_operators(conn, rng, operators, motivation_rows, created_at)
+        payments = _insert_calculations(conn, rng, operator_rows, calculations, start, end)
+        print("  applying the remaining migrations", file=sys.stderr)
+        _migrate(conn, LOAD_AT_VERSION, schema_manager.latest_version())
+        conn.execute("COMMIT")
+        conn.execute("PRAGMA journal_mode = WAL")
+    except BaseException:
+        conn.close()
+        os.remove(path)
+        raise
+    conn.close()
+    return {
+        "seed": seed,
+        "operators": operators,
+        "motivations": motivations,
+        "calculations": calculations,
+        "payments": payments,
+        "start_date": start.date().isoformat(),
+        "end_date": end_date,
+        "schema_version": schema_manager.latest_version(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic payroll database for benchmarks")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--operators", type=int, help="overrides the scale's operator count")
+    parser.add_argument("--calculations", type=int, help="overrides the scale's calculation count")
+    parser.add_argument("--motivations", type=int, default=12)
+    parser.add_argument("--days", type=int, default=365, help="length of the calculation history")
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="output directory (default: bench_data/<scale>)")
+    parser.add_argument("--force", action="store_true", help="replace an existing dataset")
+    args = parser.parse_args(argv)
+
+    operators = args.operators or SCALES[args.scale]["operators"]
+    calculations = args.calculations if args.calculations is not None else SCALES[args.scale]["calculations"]
+    out = args.out or os.path.join("bench_data", args.scale)
+    os.makedirs(out, exist_ok=True)
+    path = os.path.join(out, "operators.db")
+    if os.path.exists(path):
+        if not args.force:
+            raise SystemExit(f"{path} already exists; use --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    print(f"Generating {operators} operators and {calculations} calculations into {path}", file=sys.stderr)
+    dataset = generate(path, operators, calculations, args.motivations, args.days, args.end_date, args.seed)
+    dataset["scale"] = None if args.operators or args.calculations is not None else args.scale
+    with open(os.path.join(out, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump(dataset, f, indent=2)
+    print(json.dumps(dataset))
+
+
+if __name__ == "__main__":
+    main()
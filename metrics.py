@@ -0,0 +1,147 @@
+"""Request latency and SQL query metrics in Prometheus text format (GET /api/metrics).
+
+init_app() times every request into a histogram per route, method and status.
+ManagedConnection reports each statement it runs (time and rows fetched) to
+record_query(), which adds it to the process totals and to the current
+request's tally; a request that runs more than QUERY_COUNT_THRESHOLD
+statements is counted and logged as query-heavy (typically an N+1 loop).
+
+Metrics are kept per process; with several serve.py workers every series
+carries a `worker` label with the process id.
+"""
+import logging
+import os
+import threading
+import time
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_THRESHOLD = int(os.environ.get("METRICS_QUERY_THRESHOLD", "50"))
+
+_lock = threading.Lock()
+_local = threading.local()
+
+# (route, method, status) -> [bucket counts..., +Inf count, sum]
+_latency = {}
+# route -> [queries, rows, query seconds, query-heavy requests]
+_route_queries = {}
+# [queries, rows, seconds] for every statement, inside a request or not
+_queries = [0, 0, 0.0]
+
+
+def record_query(seconds, statements=1, rows=0):
+    """Called by ManagedConnection for each executed statement (and each fetch, with statements=0).
+
+    Inside a request only the thread's own tally is touched (no lock); it is
+    added to the process totals when the request ends.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        with _lock:
+            stats = _queries
+            stats[0] += statements
+            stats[1] += rows
+            stats[2] += seconds
+        return
+    stats[0] += statements
+    stats[1] += rows
+    stats[2] += seconds
+
+
+def _begin_request():
+    _local.stats = [0, 0, 0.0]
+    _local.started = time.perf_counter()
+
+
+def _end_request(response):
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - _local.started
+    _local.stats = None
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    queries, rows, query_seconds = stats
+    heavy = queries > QUERY_COUNT_THRESHOLD
+
+    with _lock:
+        key = (route, request.method, str(response.status_code))
+        histogram = _latency.get(key)
+        if histogram is None:
+            histogram = _latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                histogram[index] += 1
+        histogram[len(LATENCY_BUCKETS)] += 1
+        histogram[-1] += elapsed
+
+        totals = _route_queries.setdefault(route, [0, 0, 0.0, 0])
+        totals[0] += queries
+        totals[1] += rows
+        totals[2] += query_seconds
+        totals[3] += heavy
+        _queries[0] += queries
+        _queries[1] += rows
+        _queries[2] += query_seconds
+
+    response.headers["X-Query-Count"] = str(queries)
+    if heavy:
+        logger.warning("%s %s ran %d SQL statements (threshold %d)", request.method, request.path, queries,
+                       QUERY_COUNT_THRESHOLD)
+    return response
+
+
+def _labels(**labels):
+    labels["worker"] = os.getpid()
+    return ",".join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        latency = {key: list(values) for key, values in _latency.items()}
+        route_queries = {route: list(values) for route, values in _route_queries.items()}
+        queries = list(_queries)
+
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route, method and status.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (route, method, status), values in sorted(latency.items()):
+        labels = _labels(route=route, method=method, status=status)
+        # Bucket counts are stored cumulatively.
+        for bound, count in zip(LATENCY_BUCKETS, values):
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {values[len(LATENCY_BUCKETS)]}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {values[-1]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {values[len(LATENCY_BUCKETS)]}")
+
+    per_route = (
+        ("http_request_queries_total", "SQL statements run while serving the route.", 0, "{}"),
+        ("http_request_query_rows_total", "Rows fetched while serving the route.", 1, "{}"),
+        ("http_request_query_seconds_total", "Time spent in SQL while serving the route.", 2, "{:.6f}"),
+        ("http_requests_query_heavy_total",
+         f"Requests that ran more than {QUERY_COUNT_THRESHOLD} SQL statements.", 3, "{}"),
+    )
+    for name, help_text, index, number in per_route:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for route, values in sorted(route_queries.items()):
+            lines.append(f"{name}{{{_labels(route=route)}}} {number.format(values[index])}")
+
+    for name, help_text, value in (
+        ("db_queries_total", "SQL statements run through the connection pool.", str(queries[0])),
+        ("db_query_rows_total", "Rows fetched through the connection pool.", str(queries[1])),
+        ("db_query_seconds_total", "Time spent in SQL through the connection pool.", f"{queries[2]:.6f}"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{{{_labels()}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    app.before_request(_begin_request)
+    app.after_request(_end_request)
@@ -0,0 +1,201 @@
+"""Vectorized MotivationEngine: evaluate one motivation for many inputs at once.
+
+Inputs are column arrays (one row per calculation); outputs are column arrays
+for every MotivationRuleResult field. The arithmetic mirrors the scalar engine
+operation for operation, so results are bit-identical to a Python loop over
+MotivationEngine.evaluate / derive_amounts (see check_motivation_batch.py).
+"""
+from dataclasses import fields
+from typing import Any, Dict
+
+import numpy as np
+
+from motivation_engine import (
+    COMPONENT_KEYS,
+    MotivationEngine,
+    MotivationPlan,
+    MotivationRuleResult,
+    PayoutBlock,
+    ProgressiveRanges,
+)
+
+RESULT_FIELDS = tuple(f.name for f in fields(MotivationRuleResult))
+
+
+def _column(values, size=None) -> np.ndarray:
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim == 0 and size is not None:
+        array = np.full(size, float(array))
+    return array
+
+
+def lookup_ranges(ranges: ProgressiveRanges, values: np.ndarray) -> np.ndarray:
+    """Vectorized ProgressiveRanges.lookup using np.searchsorted."""
+    gap_percents = np.asarray(ranges.gap_percents, dtype=np.float64)
+    if not ranges.points:
+        return np.full(values.shape, gap_percents[0])
+    points = np.asarray(ranges.points, dtype=np.float64)
+    point_percents = np.asarray(ranges.point_percents, dtype=np.float64)
+    index = np.searchsorted(points, values, side="left")
+    clipped = np.minimum(index, len(points) - 1)
+    exact = (index < len(points)) & (points[clipped] == values)
+    return np.where(exact, point_percents[clipped], gap_percents[index])
+
+
+def _fixed_salary_payout(block: PayoutBlock, kc, sales, redemption, days):
+    zeros = np.zeros(kc.shape)
+    if block.value <= 0:
+        return zeros, zeros
+    return np.where(days > 0, block.value / 20.0 * days, 0.0), zeros
+
+
+def _percent_sales_payout(block: PayoutBlock, kc, sales, redemption, days):
+    return sales * block.value / 100.0, np.zeros(kc.shape)
+
+
+def _percent_redeemed_payout(block: PayoutBlock, kc, sales, redemption, days):
+    return kc * block.value / 100.0, np.full(kc.shape, block.value)
+
+
+def _progressive_payout(block: PayoutBlock, kc, sales, redemption, days):
+    percent = lookup_ranges(block.ranges, redemption)
+    return kc * percent / 100.0, percent
+
+
+def _fixed_bonus_payout(block: PayoutBlock, kc, sales, redemption, days):
+    return np.full(kc.shape, block.value), np.zeros(kc.shape)
+
+
+_BATCH_PAYOUT_RULES = {
+    "fixed_salary": _fixed_salary_payout,
+    "percent_sales": _percent_sales_payout,
+    "percent_redeemed": _percent_redeemed_payout,
+    "progressive_redemption": _progressive_payout,
+    "fixed_bonus": _fixed_bonus_payout,
+}
+
+
+def evaluate_batch(
+    plan: MotivationPlan,
+    kc_amount,
+    sales_amount,
+    redemption_percent,
+    working_days_in_period,
+) -> Dict[str, np.ndarray]:
+    """Batch counterpart of MotivationEngine.evaluate; scalars are broadcast."""
+    kc = np.atleast_1d(_column(kc_amount))
+    size = kc.shape[0]
+    sales = _column(sales_amount, size)
+    redemption = _column(redemption_percent, size)
+    days = np.nan_to_num(_column(working_days_in_period, size))
+
+    totals = {key: np.zeros(kc.shape) for key in COMPONENT_KEYS}
+    kc_percent = np.zeros(kc.shape)
+    one_of = []
+
+    for block in plan.blocks:
+        payout, block_percent = _BATCH_PAYOUT_RULES[block.block_type](block, kc, sales, redemption, days)
+        positive = payout > 0
+        if block.one_of:
+            one_of.append((block, np.where(positive, payout, -np.inf), block_percent))
+            continue
+        totals[block.component] += np.where(positive, payout, 0.0)
+        if block.component == "redemption_component":
+            kc_percent = np.where(positive, np.maximum(kc_percent, block_percent), kc_percent)
+
+    if one_of:
+        payouts = np.vstack([payout for _, payout, _ in one_of])
+        # argmax keeps the first maximum, like max() over the scalar list.
+        winner = np.argmax(payouts, axis=0)
+        best = payouts[winner, np.arange(kc.shape[0])]
+        selected = best > 0
+        for position, (block, _, block_percent) in enumerate(one_of):
+            chosen = selected & (winner == position)
+            totals[block.component] += np.where(chosen, best, 0.0)
+            if block.component == "redemption_component":
+                kc_percent = np.where(chosen, np.maximum(kc_percent, block_percent), kc_percent)
+
+    if plan.plan_value > 0:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plan_target = np.where(days != 0, plan.plan_value / plan.plan_base_days * days, 0.0)
+            has_plan = plan_target > 0
+            plan_completion = np.where(has_plan, sales / np.where(has_plan, plan_target, 1.0), 1.0)
+    else:
+        plan_target = np.zeros(kc.shape)
+        plan_completion = np.ones(kc.shape)
+
+    return {
+        "kc_percent": kc_percent,
+        "base_salary": totals["base_salary"],
+        "sales_component": totals["sales_component"],
+        "redemption_component": totals["redemption_component"],
+        "fixed_bonuses": totals["fixed_bonuses"],
+        "percentage_bonus_value": np.full(kc.shape, plan.percentage_bonus),
+        "plan_multiplier": plan_completion.copy(),
+        "plan_target": plan_target,
+        "plan_completion": plan_completion,
+    }
+
+
+def calculate_components_batch(config: Dict[str, Any], *columns) -> Dict[str, np.ndarray]:
+    return evaluate_batch(MotivationEngine.compile(config), *columns)
+
+
+def derive_amounts_batch(kc_amount, non_kc_amount, sales_amount, redemption_percent=None):
+    """Batch counterpart of derive_amounts; NaN marks a value that was not provided."""
+    kc_in = np.atleast_1d(_column(kc_amount))
+    size = kc_in.shape[0]
+    non_in = _column(non_kc_amount, size)
+    sales_in = _column(sales_amount, size)
+    red_in = _column(np.nan if redemption_percent is None else redemption_percent, size)
+
+    kc_p, non_p, sales_p, red_p = (~np.isnan(a) for a in (kc_in, non_in, sales_in, red_in))
+    provided = kc_p.astype(int) + non_p + sales_p + red_p
+
+    kc = np.where(kc_p, kc_in, 0.0)
+    non_kc = np.where(non_p, non_in, 0.0)
+    sales = np.where(sales_p, sales_in, 0.0)
+    red = np.where(red_p, red_in, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        remaining = provided >= 2
+        case = remaining & kc_p & sales_p
+        non_kc = np.where(case, np.maximum(sales - kc, 0.0), non_kc)
+        remaining &= ~case
+
+        case = remaining & kc_p & non_p
+        sales = np.where(case, kc + non_kc, sales)
+        remaining &= ~case
+
+        case = remaining & sales_p & non_p
+        kc = np.where(case, np.maximum(sales - non_kc, 0.0), kc)
+        remaining &= ~case
+
+        case = remaining & sales_p & red_p
+        kc = np.where(case, sales * red / 100.0, kc)
+        non_kc = np.where(case, np.maximum(sales - kc, 0.0), non_kc)
+        remaining &= ~case
+
+        case = remaining & kc_p & red_p & (red != 0)
+        sales = np.where(case, kc * 100.0 / red, sales)
+        non_kc = np.where(case, np.maximum(sales - kc, 0.0), non_kc)
+        remaining &= ~case
+
+        case = remaining & non_p & red_p & (red < 100)
+        sales = np.where(case, non_kc * 100.0 / (100.0 - red), sales)
+        kc = np.where(case, np.maximum(sales - non_kc, 0.0), kc)
+
+        single = provided == 1
+        case = single & sales_p
+        kc = np.where(case, sales, kc)
+        non_kc = np.where(case, 0.0, non_kc)
+        case = single & ~sales_p & kc_p
+        sales = np.where(case, kc, sales)
+        non_kc = np.where(case, 0.0, non_kc)
+        case = single & ~sales_p & ~kc_p & non_p
+        sales = np.where(case, non_kc, sales)
+        kc = np.where(case, 0.0, kc)
+
+        positive = sales > 0
+        redemption = np.where(positive, (kc / np.where(positive, sales, 1.0)) * 100.0, 0.0)
+    return kc, non_kc, sales, redemption
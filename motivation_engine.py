@@ -1,5 +1,9 @@
+import hashlib
 import json
-from dataclasses import dataclass
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple
 
 @dataclass
@@ -15,7 +19,147 @@ class MotivationRuleResult:
     plan_completion: float
 
 
+COMPONENT_KEYS = ("base_salary", "sales_component", "redemption_component", "fixed_bonuses")
+PLAN_CACHE_SIZE = 256
+
+
+def _number(value: Any) -> float:
+    return float(value or 0)
+
+
+@dataclass(frozen=True)
+class ProgressiveRanges:
+    """Progressive redemption ranges flattened into disjoint intervals.
+
+    `points` are the sorted range boundaries. A value equal to points[i] gets
+    point_percents[i]; a value strictly between points[i - 1] and points[i]
+    gets gap_percents[i]. Each interval holds the percent of the first range
+    (in config order) that covers it, so lookups agree with a linear scan.
+    """
+
+    points: Tuple[float, ...]
+    point_percents: Tuple[float, ...]
+    gap_percents: Tuple[float, ...]
+
+    def lookup(self, value: float) -> float:
+        index = bisect_left(self.points, value)
+        if index < len(self.points) and self.points[index] == value:
+            return self.point_percents[index]
+        return self.gap_percents[index]
+
+
+@dataclass(frozen=True)
+class PayoutBlock:
+    block_type: str
+    component: str
+    one_of: bool
+    value: float
+    ranges: Optional[ProgressiveRanges] = None
+
+
+@dataclass(frozen=True)
+class MotivationPlan:
+    """Immutable, pre-validated form of a motivation config_json."""
+
+    blocks: Tuple[PayoutBlock, ...]
+    percentage_bonus: float
+    plan_value: float
+    plan_base_days: float
+    config: Dict[str, Any] = field(default_factory=dict, compare=False, hash=False)
+
+
+def _compile_ranges(block: Dict[str, Any]) -> ProgressiveRanges:
+    default_percent = _number(block.get("percent"))
+    ranges = []
+    for rng in block.get("ranges") or []:
+        if not isinstance(rng, dict):
+            continue
+        end_raw = rng.get("to")
+        ranges.append((
+            _number(rng.get("from")),
+            float(end_raw) if end_raw is not None else None,
+            _number(rng.get("percent")),
+        ))
+
+    def first_match(value: float) -> float:
+        for start, end, percent in ranges:
+            if value >= start and (end is None or value <= end):
+                return percent
+        return default_percent
+
+    points = sorted({start for start, _, _ in ranges} | {end for _, end, _ in ranges if end is not None})
+    if not points:
+        return ProgressiveRanges((), (), (default_percent,))
+    gap_probes = [points[0] - 1.0]
+    gap_probes += [(low + high) / 2.0 for low, high in zip(points, points[1:])]
+    gap_probes.append(points[-1] + 1.0)
+    return ProgressiveRanges(
+        points=tuple(points),
+        point_percents=tuple(first_match(point) for point in points),
+        gap_percents=tuple(first_match(probe) for probe in gap_probes),
+    )
+
+
+def _compile_payout(component: str, value_key: str):
+    def compile_block(block: Dict[str, Any], one_of: bool) -> PayoutBlock:
+        return PayoutBlock(block["type"], component, one_of, _number(block.get(value_key)))
+
+    return compile_block
+
+
+def _compile_progressive(block: Dict[str, Any], one_of: bool) -> PayoutBlock:
+    return PayoutBlock(block["type"], "redemption_component", one_of, 0.0, _compile_ranges(block))
+
+
+_BLOCK_COMPILERS = {
+    "fixed_salary": _compile_payout("base_salary", "monthly_amount"),
+    "percent_sales": _compile_payout("sales_component", "percent"),
+    "percent_redeemed": _compile_payout("redemption_component", "percent"),
+    "progressive_redemption": _compile_progressive,
+    "fixed_bonus": _compile_payout("fixed_bonuses", "amount"),
+}
+
+
+# Each rule returns (payout, block_percent) for one block.
+def _fixed_salary_payout(block, kc_amount, sales_amount, redemption_percent, days):
+    if block.value > 0 and days > 0:
+        return block.value / 20.0 * days, 0.0
+    return 0.0, 0.0
+
+
+def _percent_sales_payout(block, kc_amount, sales_amount, redemption_percent, days):
+    return sales_amount * block.value / 100.0, 0.0
+
+
+def _percent_redeemed_payout(block, kc_amount, sales_amount, redemption_percent, days):
+    return kc_amount * block.value / 100.0, block.value
+
+
+def _progressive_payout(block, kc_amount, sales_amount, redemption_percent, days):
+    percent = block.ranges.lookup(redemption_percent)
+    return kc_amount * percent / 100.0, percent
+
+
+def _fixed_bonus_payout(block, kc_amount, sales_amount, redemption_percent, days):
+    return block.value, 0.0
+
+
+_PAYOUT_RULES = {
+    "fixed_salary": _fixed_salary_payout,
+    "percent_sales": _percent_sales_payout,
+    "percent_redeemed": _percent_redeemed_payout,
+    "progressive_redemption": _progressive_payout,
+    "fixed_bonus": _fixed_bonus_payout,
+}
+
+
+EMPTY_PLAN = MotivationPlan(blocks=(), percentage_bonus=0.0, plan_value=0.0, plan_base_days=20.0)
+
+
 class MotivationEngine:
+    _plan_cache: "OrderedDict[Tuple[Any, str], MotivationPlan]" = OrderedDict()
+    _plan_cache_lock = threading.Lock()
+
     @staticmethod
     def parse_config(config_json: str) -> Dict[str, Any]:
         try:
@@ -24,112 +168,118 @@ class MotivationEngine:
             return {}
 
     @staticmethod
-    def _pick_progressive_percent(block: Dict[str, Any], redemption_percent: float) -> float:
-        ranges = block.get("ranges") or []
-        for rng in ranges:
-            start = float(rng.get("from", 0))
-            end_raw = rng.get("to")
-            end = float(end_raw) if end_raw is not None else None
-            if redemption_percent >= start and (end is None or redemption_percent <= end):
-                return float(rng.get("percent") or 0)
-        return float(block.get("percent") or 0)
+    def config_hash(config_json: str) -> str:
+        return hashlib.sha1((config_json or "").encode("utf-8")).hexdigest()
 
     @staticmethod
-    def calculate_components(
-        config: Dict[str, Any],
-        kc_amount: float,
-        sales_amount: float,
-        redemption_percent: float,
-        working_days_in_period: float,
-    ) -> MotivationRuleResult:
-        blocks: List[Dict[str, Any]] = config.get("blocks") or []
-        together_totals = {
-            "base_salary": 0.0,
-            "sales_component": 0.0,
-            "redemption_component": 0.0,
-            "fixed_bonuses": 0.0,
-        }
-        one_of_rewards: List[Tuple[float, str, float]] = []
-        percentage_bonuses: List[float] = []
-        plan_target = 0.0
-        plan_completion = 1.0
-        kc_percent_value = 0.0
+    def canonical_config(config: Dict[str, Any]) -> Tuple[str, str]:
+        """Stable JSON text of a config and its SHA-256, used to address snapshots."""
+        text = json.dumps(config, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return text, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def compile(config: Dict[str, Any]) -> MotivationPlan:
+        """Normalize a parsed config into a MotivationPlan.
 
-        for block in blocks:
+        Raises ValueError/TypeError for non-numeric fields, so bad configs fail
+        when they are saved or first used instead of on every calculation.
+        """
+        if not isinstance(config, dict):
+            config = {}
+        blocks: List[PayoutBlock] = []
+        percentage_bonus = 0.0
+        plan_value = 0.0
+        plan_base_days = 20.0
+
+        for block in config.get("blocks") or []:
             if not isinstance(block, dict):
                 continue
             block_type = block.get("type")
-            apply_mode = block.get("apply_mode") or "together"
-
-            payout = 0.0
-            component_key = ""
-            block_percent = 0.0
-
-            if block_type == "fixed_salary":
-                monthly = float(block.get("monthly_amount") or 0)
-                days_in_period = float(working_days_in_period or 0)
-                if monthly > 0 and days_in_period > 0:
-                    payout = monthly / 20.0 * days_in_period
-                    component_key = "base_salary"
-
-            elif block_type == "percent_sales":
-                percent = float(block.get("percent") or 0)
-                payout = sales_amount * percent / 100.0
-                component_key = "sales_component"
-
-            elif block_type == "percent_redeemed":
-                percent = float(block.get("percent") or 0)
-                block_percent = percent
-                payout = kc_amount * percent / 100.0
-                component_key = "redemption_component"
-
-            elif block_type == "progressive_redemption":
-                percent = MotivationEngine._pick_progressive_percent(block, redemption_percent)
-                block_percent = percent
-                payout = kc_amount * percent / 100.0
-                component_key = "redemption_component"
-
-            elif block_type == "fixed_bonus":
-                payout = float(block.get("amount") or 0)
-                component_key = "fixed_bonuses"
-
-            elif block_type == "percentage_bonus":
-                percent = float(block.get("percent") or 0)
+            if block_type == "percentage_bonus":
+                percent = _number(block.get("percent"))
                 if percent:
-                    percentage_bonuses.append(percent)
+                    percentage_bonus += percent
                 continue
-
-            elif block_type == "sales_plan":
-                plan_value = float(block.get("plan_value") or 0)
-                plan_period = block.get("plan_period") or "monthly"
-                if plan_value > 0 and working_days_in_period:
-                    base_days = 5.0 if plan_period == "weekly" else 20.0
-                    plan_target = plan_value / base_days * working_days_in_period
-                    if plan_target > 0:
-                        plan_completion = sales_amount / plan_target
+            if block_type == "sales_plan":
+                value = _number(block.get("plan_value"))
+                if value > 0:
+                    # Only the last active plan block ends up applied.
+                    plan_value = value
+                    plan_base_days = 5.0 if (block.get("plan_period") or "monthly") == "weekly" else 20.0
+                continue
+            compile_block = _BLOCK_COMPILERS.get(block_type)
+            if compile_block is None:
                 continue
+            blocks.append(compile_block(block, (block.get("apply_mode") or "together") == "one_of"))
+
+        return MotivationPlan(
+            blocks=tuple(blocks),
+            percentage_bonus=percentage_bonus,
+            plan_value=plan_value,
+            plan_base_days=plan_base_days,
+            config=config,
+        )
 
+    @classmethod
+    def get_plan(cls, motivation_id: Any, config_json: str) -> MotivationPlan:
+        """Return the compiled plan for a motivation, cached by id and content hash."""
+        key = (motivation_id, cls.config_hash(config_json))
+        with cls._plan_cache_lock:
+            plan = cls._plan_cache.get(key)
+            if plan is not None:
+                cls._plan_cache.move_to_end(key)
+                return plan
+        plan = cls.compile(cls.parse_config(config_json))
+        with cls._plan_cache_lock:
+            cls._plan_cache[key] = plan
+            cls._plan_cache.move_to_end(key)
+            while len(cls._plan_cache) > PLAN_CACHE_SIZE:
+                cls._plan_cache.popitem(last=False)
+        return plan
+
+    @classmethod
+    def clear_plan_cache(cls) -> None:
+        with cls._plan_cache_lock:
+            cls._plan_cache.clear()
+
+    @staticmethod
+    def evaluate(
+        plan: MotivationPlan,
+        kc_amount: float,
+        sales_amount: float,
+        redemption_percent: float,
+        working_days_in_period: float,
+    ) -> MotivationRuleResult:
+        days = float(working_days_in_period or 0)
+        together_totals = dict.fromkeys(COMPONENT_KEYS, 0.0)
+        best_one_of: Optional[Tuple[float, str, float]] = None
+        kc_percent_value = 0.0
+
+        for block in plan.blocks:
+            payout, block_percent = _PAYOUT_RULES[block.block_type](
+                block, kc_amount, sales_amount, redemption_percent, days
+            )
             if payout <= 0:
                 continue
-
-            if apply_mode == "one_of":
-                one_of_rewards.append((payout, component_key, block_percent))
+            if block.one_of:
+                if best_one_of is None or payout > best_one_of[0]:
+                    best_one_of = (payout, block.component, block_percent)
             else:
-                together_totals[component_key] += payout
-                if component_key == "redemption_component":
+                together_totals[block.component] += payout
+                if block.component == "redemption_component":
                     kc_percent_value = max(kc_percent_value, block_percent)
 
-        selected_one = max(one_of_rewards, key=lambda x: x[0], default=(0.0, "", 0.0))
-        if selected_one[0] > 0 and selected_one[1]:
-            together_totals[selected_one[1]] += selected_one[0]
-            if selected_one[1] == "redemption_component":
-                kc_percent_value = max(kc_percent_value, selected_one[2])
-
-        base_total = sum(together_totals.values())
-
-        plan_multiplier = plan_completion if plan_target > 0 else 1.0
+        if best_one_of is not None:
+            together_totals[best_one_of[1]] += best_one_of[0]
+            if best_one_of[1] == "redemption_component":
+                kc_percent_value = max(kc_percent_value, best_one_of[2])
 
-        percent_bonus_value = sum(percentage_bonuses)
+        plan_target = 0.0
+        plan_completion = 1.0
+        if plan.plan_value > 0 and days:
+            plan_target = plan.plan_value / plan.plan_base_days * days
+            if plan_target > 0:
+                plan_completion = sales_amount / plan_target
 
         return MotivationRuleResult(
             kc_percent=kc_percent_value,
@@ -137,12 +287,28 @@ class MotivationEngine:
             sales_component=together_totals["sales_component"],
             redemption_component=together_totals["redemption_component"],
             fixed_bonuses=together_totals["fixed_bonuses"],
-            percentage_bonus_value=percent_bonus_value,
-            plan_multiplier=plan_multiplier,
+            percentage_bonus_value=plan.percentage_bonus,
+            plan_multiplier=plan_completion if plan_target > 0 else 1.0,
             plan_target=plan_target,
             plan_completion=plan_completion if plan_target > 0 else 1.0,
         )
 
+    @staticmethod
+    def calculate_components(
+        config: Dict[str, Any],
+        kc_amount: float,
+        sales_amount: float,
+        redemption_percent: float,
+        working_days_in_period: float,
+    ) -> MotivationRuleResult:
+        return MotivationEngine.evaluate(
+            MotivationEngine.compile(config),
+            kc_amount,
+            sales_amount,
+            redemption_percent,
+            working_days_in_period,
+        )
+
 
 def _to_number(value: Optional[float]) -> Optional[float]:
     if value in (None, ""):
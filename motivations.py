@@ -1,7 +1,10 @@
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 from config import get_db_connection, log_action
+from motivation_engine import MotivationEngine
 
 # READ
 # =========================
@@ -37,13 +40,74 @@ def get_motivation(motivation_id):
     return dict(row) if row else None
 
 
+# =========================
+# VERSIONS (SNAPSHOTS)
+# =========================
+# Calculations reference the exact config they were computed with through
+# motivation_versions, an append-only table keyed by content hash.
+
+# Versions never change once written; the most recently used ones are cached
+# (least recently used evicted first, like MotivationEngine.get_plan).
+VERSION_CACHE_SIZE = 1024
+_version_cache = OrderedDict()
+_version_cache_lock = threading.Lock()
+
+
+def store_motivation_version(conn, config):
+    """Return the motivation_versions id for config, inserting it if new.
+
+    Runs on the caller's connection so it commits with the calculation row.
+    """
+    text, content_hash = MotivationEngine.canonical_config(config)
+    conn.execute(
+        "INSERT OR IGNORE INTO motivation_versions (content_hash, config_json) VALUES (?, ?)",
+        (content_hash, text),
+    )
+    return conn.execute(
+        "SELECT id FROM motivation_versions WHERE content_hash = ?",
+        (content_hash,),
+    ).fetchone()["id"]
+
+
+def resolve_motivation_snapshots(conn, rows):
+    """Fill motivation_snapshot on calculation dicts from their version id."""
+    version_ids = {row["motivation_version_id"] for row in rows if row.get("motivation_version_id")}
+    snapshots = {}
+    with _version_cache_lock:
+        for version_id in version_ids:
+            if version_id in _version_cache:
+                _version_cache.move_to_end(version_id)
+                snapshots[version_id] = _version_cache[version_id]
+    missing = sorted(version_ids - snapshots.keys())
+    fetched = {}
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        for version in conn.execute(
+            f"SELECT id, config_json FROM motivation_versions WHERE id IN ({placeholders})",
+            chunk,
+        ).fetchall():
+            fetched[version["id"]] = version["config_json"]
+    if fetched:
+        snapshots.update(fetched)
+        with _version_cache_lock:
+            _version_cache.update(fetched)
+            while len(_version_cache) > VERSION_CACHE_SIZE:
+                _version_cache.popitem(last=False)
+    for row in rows:
+        version_id = row.get("motivation_version_id")
+        if version_id and not row.get("motivation_snapshot"):
+            row["motivation_snapshot"] = snapshots.get(version_id)
+    return rows
+
+
 # =========================
 # CREATE / UPDATE
 # =========================
 
 def add_motivation(name, motivation_type, config_json, description=None):
-    # config_json must be valid JSON string
-    json.loads(config_json)
+    # config_json must be valid JSON with numeric fields; compiling checks both
+    MotivationEngine.compile(json.loads(config_json))
     motivation_type = motivation_type or "composite"
 
     conn = get_db_connection()
@@ -64,7 +128,7 @@ def add_motivation(name, motivation_type, config_json, description=None):
 
 
 def update_motivation(motivation_id, name, motivation_type, config_json, description=None, is_active=1):
-    json.loads(config_json)
+    MotivationEngine.compile(json.loads(config_json))
     motivation_type = motivation_type or "composite"
 
     conn = get_db_connection()
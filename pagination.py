@@ -0,0 +1,117 @@
+import base64
+import json
+
+from config import get_db_connection
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Large TEXT columns that list endpoints only return when asked for by name.
+HEAVY_COLUMNS = {
+    "manual_calculations": ("motivation_snapshot", "calculation_breakdown"),
+    "payments": (),
+}
+
+# Columns every page needs to build the next cursor.
+KEY_COLUMNS = ("id", "calculation_day")
+
+_table_columns = {}
+
+
+def page_size(value):
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    return min(max(int(value), 1), MAX_PAGE_SIZE)
+
+
+def encode_cursor(row):
+    raw = json.dumps([row["calculation_day"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (calculation_day, id) from an opaque cursor; ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        calculation_day, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(calculation_day, int) or not isinstance(row_id, int):
+        raise ValueError("invalid cursor")
+    return calculation_day, row_id
+
+
+def next_cursor(rows, limit):
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if not limit or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1])
+
+
+def keyset_page(conn, query, params, alias, cursor=None, limit=None):
+    """Run `query` (a SELECT ending in its WHERE clause) one page at a time.
+
+    Rows come newest first by (calculation_day, id); the row-value comparison
+    seeks straight to the cursor in the (is_deleted, calculation_day) and
+    (operator_id, calculation_day) indexes. Rows with an unknown date have
+    day -1 and come last.
+    """
+    params = list(params)
+    if cursor:
+        query += f" AND ({alias}.calculation_day, {alias}.id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    query += f" ORDER BY {alias}.calculation_day DESC, {alias}.id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+
+def table_columns(conn, table):
+    if table not in _table_columns:
+        # table_xinfo also lists generated columns such as calculation_day.
+        _table_columns[table] = tuple(row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})"))
+    return _table_columns[table]
+
+
+def select_columns(conn, table, alias, fields=None, extra=(), include=()):
+    """SELECT list for a `fields=` projection.
+
+    `fields` is a comma-separated string; None means every column except the
+    heavy ones and "*" means every column. `extra` names computed columns
+    (e.g. operator_name) that the caller adds when requested; `include` names
+    columns the caller needs whatever the projection.
+    Returns the SQL fragment and the list of names that will be in each row.
+    """
+    columns = table_columns(conn, table)
+    if fields is None or not fields.strip():
+        selected = [name for name in columns if name not in HEAVY_COLUMNS.get(table, ())]
+        selected.extend(extra)
+    elif fields.strip() == "*":
+        selected = list(columns) + list(extra)
+    else:
+        selected = []
+        for name in (part.strip() for part in fields.split(",")):
+            if not name or name in selected:
+                continue
+            if name not in columns and name not in extra:
+                raise ValueError(f"unknown field: {name}")
+            selected.append(name)
+        for name in reversed(KEY_COLUMNS):
+            if name not in selected:
+                selected.insert(0, name)
+    selected.extend(name for name in include if name not in selected)
+    return ", ".join(f"{alias}.{name}" for name in selected if name not in extra), selected
+
+
+def live_row_count(table, operator_id=None):
+    """Number of non-deleted rows, read from the trigger-maintained row_counts table."""
+    conn = get_db_connection()
+    query = "SELECT COALESCE(SUM(live_rows), 0) FROM row_counts WHERE table_name = ?"
+    params = [table]
+    if operator_id:
+        query += " AND operator_id = ?"
+        params.append(operator_id)
+    count = conn.execute(query, params).fetchone()[0]
+    conn.close()
+    return count
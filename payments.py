@@ -1,10 +1,39 @@
-﻿from config import get_db_connection, log_action
+﻿import json
+
+from config import get_db_connection, log_action
 from datetime import datetime
 
+from day_keys import day_filter, to_day
+from pagination import keyset_page, select_columns
+
 # =========================
 # CREATE PAYMENT (SAFE)
 # =========================
 
+def find_live_payment(conn, operator_id, calculation_date, calculation_id=None):
+    """Id of the live payment for these keys, or None.
+
+    Matches by calculation_id first, then by operator and calculation_date
+    among payments without a calculation (legacy ones that predate
+    calculation_id), so another calculation's payment is never returned. Both
+    lookups are served by indexes (uq_payments_calculation,
+    idx_payments_operator_date).
+    """
+    if calculation_id is not None:
+        row = conn.execute(
+            'SELECT id FROM payments WHERE calculation_id = ? AND is_deleted = 0',
+            (calculation_id,)
+        ).fetchone()
+        if row:
+            return row['id']
+    row = conn.execute(
+        'SELECT id FROM payments '
+        'WHERE operator_id = ? AND calculation_date = ? AND calculation_id IS NULL AND is_deleted = 0',
+        (operator_id, calculation_date)
+    ).fetchone()
+    return row['id'] if row else None
+
+
 def create_payment(
     operator_id,
     calculation_date,
@@ -17,28 +46,28 @@ def create_payment(
 ):
     conn = get_db_connection()
 
-    existing = conn.execute(
-        '''
-        SELECT id FROM payments
-        WHERE is_deleted = 0 AND (
-            (calculation_id IS NOT NULL AND calculation_id = COALESCE(?, calculation_id))
-            OR (operator_id = ? AND calculation_date = ?)
-        )
-        ''',
-        (calculation_id, operator_id, calculation_date)
-    ).fetchone()
-
-    if existing:
-        conn.close()
-        return existing['id']
-
-    cursor = conn.cursor()
-    cursor.execute(
+    if calculation_id is None:
+        # No unique index covers payments without a calculation, so check for
+        # an existing operator/date payment under the write lock instead. A
+        # transaction the caller already opened holds that lock (sqlite3 only
+        # begins one before a write), so it is reused.
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        existing_id = find_live_payment(conn, operator_id, calculation_date)
+        if existing_id is not None:
+            conn.commit()
+            conn.close()
+            return existing_id
+
+    # uq_payments_calculation makes this idempotent for calculation payments:
+    # a duplicate is skipped by the INSERT itself, even under concurrent requests.
+    cursor = conn.execute(
         '''
         INSERT INTO payments
         (operator_id, calculation_date, total_salary, is_paid,
          period_start, period_end, sales_amount, calculation_id, correction_date)
         VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
         ''',
         (
             operator_id,
@@ -52,6 +81,12 @@ def create_payment(
         )
     )
 
+    if cursor.rowcount == 0:
+        payment_id = find_live_payment(conn, operator_id, calculation_date, calculation_id)
+        conn.commit()
+        conn.close()
+        return payment_id
+
     payment_id = cursor.lastrowid
     conn.commit()
     conn.close()
@@ -69,11 +104,16 @@ def create_payment(
 # READ PAYMENTS (SAFE)
 # =========================
 
-def get_payments(operator_id=None, start_date=None, end_date=None, include_deleted=False):
+def get_payments(
+    operator_id=None, start_date=None, end_date=None, include_deleted=False, limit=None, cursor=None, fields=None
+):
     conn = get_db_connection()
+    columns, selected = select_columns(conn, 'payments', 'p', fields, extra=('operator_name',))
+    if 'operator_name' in selected:
+        columns += ', o.name AS operator_name'
 
-    query = '''
-        SELECT p.*, o.name AS operator_name
+    query = f'''
+        SELECT {columns}
         FROM payments p
         LEFT JOIN operators o ON p.operator_id = o.id
         WHERE 1 = 1
@@ -87,17 +127,11 @@ def get_payments(operator_id=None, start_date=None, end_date=None, include_delet
         query += ' AND p.operator_id = ?'
         params.append(operator_id)
 
-    if start_date:
-        query += ' AND p.calculation_date >= ?'
-        params.append(start_date)
-
-    if end_date:
-        query += ' AND p.calculation_date <= ?'
-        params.append(end_date)
+    condition, day_params = day_filter('p.calculation_day', start_date, end_date)
+    query += condition
+    params.extend(day_params)
 
-    query += ' ORDER BY p.calculation_date DESC'
-
-    rows = conn.execute(query, params).fetchall()
+    rows = keyset_page(conn, query, params, 'p', cursor, limit)
     conn.close()
     return rows
 
@@ -185,6 +219,87 @@ def update_payment(
     log_action('payment_updated', f'Payment {payment_id} updated', operator_id)
 
 
+# =========================
+# BULK OPERATIONS
+# =========================
+
+# action -> (SET clause, extra WHERE condition). Rows already in the target
+# state are left alone, so e.g. re-paying a run keeps the original payout dates.
+BULK_ACTIONS = {
+    'mark_paid': ('is_paid = 1, payment_date = :payment_date', 'is_deleted = 0 AND is_paid = 0'),
+    'mark_unpaid': ('is_paid = 0, payment_date = NULL', 'is_deleted = 0 AND is_paid = 1'),
+    'set_payment_date': ('payment_date = :payment_date', 'is_deleted = 0 AND is_paid = 1'),
+    'delete': ('is_deleted = 1, deleted_at = :now', 'is_deleted = 0'),
+    'restore': ('is_deleted = 0, deleted_at = NULL', 'is_deleted = 1'),
+}
+
+BULK_FILTERS = {
+    'operator_id': 'operator_id = :operator_id',
+    'period_start': 'period_start = :period_start',
+    'period_end': 'period_end = :period_end',
+    'start_date': 'calculation_day >= :start_day',
+    'end_date': 'calculation_day BETWEEN 0 AND :end_day',
+}
+
+
+def bulk_update_payments(action, ids=None, filters=None, payment_date=None):
+    """Apply one action to many payments with a single UPDATE.
+
+    Targets are a list of ids, a filter dict (keys of BULK_FILTERS), or both
+    (intersection); at least one is required. Runs in one transaction and
+    writes one audit entry. Returns the ids that were actually changed.
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f'unknown action: {action}')
+    if filters is not None and not isinstance(filters, dict):
+        raise ValueError('filter must be an object')
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, '')}
+    unknown = set(filters) - set(BULK_FILTERS)
+    if unknown:
+        raise ValueError(f'unknown filter: {", ".join(sorted(unknown))}')
+    if ids is None and not filters:
+        raise ValueError('ids or filter is required')
+
+    assignments, condition = BULK_ACTIONS[action]
+    params = dict(filters)
+    params['now'] = datetime.now().isoformat()
+    params['payment_date'] = payment_date or datetime.now().strftime('%Y-%m-%d')
+    if action == 'set_payment_date' and not payment_date:
+        raise ValueError('payment_date is required')
+
+    where = [condition]
+    where.extend(BULK_FILTERS[key] for key in filters)
+    if 'start_date' in filters:
+        params['start_day'] = _required_day(filters['start_date'])
+    if 'end_date' in filters:
+        params['end_day'] = _required_day(filters['end_date'])
+    if ids is not None:
+        params['ids'] = json.dumps([int(payment_id) for payment_id in ids])
+        where.append('id IN (SELECT value FROM json_each(:ids))')
+
+    # OR IGNORE: a restore that would duplicate a live payment is skipped,
+    # just like restore_payment.
+    verb = 'UPDATE OR IGNORE' if action == 'restore' else 'UPDATE'
+    conn = get_db_connection()
+    changed = [
+        row[0]
+        for row in conn.execute(
+            f'{verb} payments SET {assignments} WHERE {" AND ".join(where)} RETURNING id',
+            params,
+        ).fetchall()
+    ]
+    conn.commit()
+    conn.close()
+
+    if changed:
+        log_action(
+            f'payments_bulk_{action}',
+            f'{len(changed)} payment(s): {", ".join(str(payment_id) for payment_id in sorted(changed))}',
+            filters.get('operator_id')
+        )
+    return changed
+
+
 # =========================
 # SOFT DELETE / RESTORE
 # =========================
@@ -211,22 +326,27 @@ def soft_delete_payment(payment_id):
 
 def restore_payment(payment_id):
     conn = get_db_connection()
-    conn.execute(
+    # A payment whose calculation already has a live payment again stays in
+    # the trash instead of breaking uq_payments_calculation.
+    cursor = conn.execute(
         '''
-        UPDATE payments
+        UPDATE OR IGNORE payments
         SET is_deleted = 0,
             deleted_at = NULL
         WHERE id = ?
         ''',
         (payment_id,)
     )
+    restored = cursor.rowcount > 0
     conn.commit()
     conn.close()
 
-    log_action(
-        'payment_restored',
-        f'Payment restored from trash: {payment_id}'
-    )
+    if restored:
+        log_action(
+            'payment_restored',
+            f'Payment restored from trash: {payment_id}'
+        )
+    return restored
 
 
 def get_deleted_payments():
@@ -254,31 +374,45 @@ def delete_payment_forever(payment_id):
 # STATISTICS (SAFE)
 # =========================
 
-def get_payment_statistics(start_date=None, end_date=None):
+def get_payment_statistics(start_date=None, end_date=None, operator_id=None):
+    """Totals for live payments, read from payment_rollups (one row per day and operator).
+
+    Dates are compared by calendar day, so end_date includes the whole day.
+    """
     conn = get_db_connection()
 
     query = '''
         SELECT
-            COUNT(*) AS total_payments,
-            SUM(total_salary) AS total_amount,
-            SUM(CASE WHEN is_paid = 1 THEN total_salary ELSE 0 END) AS paid_amount,
-            SUM(CASE WHEN is_paid = 0 THEN total_salary ELSE 0 END) AS pending_amount,
-            COUNT(CASE WHEN is_paid = 1 THEN 1 END) AS paid_count,
-            COUNT(CASE WHEN is_paid = 0 THEN 1 END) AS pending_count
-        FROM payments
-        WHERE is_deleted = 0
+            COALESCE(SUM(total_count), 0) AS total_payments,
+            COALESCE(SUM(total_amount), 0) AS total_amount,
+            COALESCE(SUM(paid_amount), 0) AS paid_amount,
+            COALESCE(SUM(pending_amount), 0) AS pending_amount,
+            COALESCE(SUM(paid_count), 0) AS paid_count,
+            COALESCE(SUM(pending_count), 0) AS pending_count
+        FROM payment_rollups
+        WHERE 1 = 1
     '''
     params = []
 
-    if start_date:
-        query += ' AND calculation_date >= ?'
-        params.append(start_date)
+    condition, day_params = day_filter('day', start_date, end_date)
+    query += condition
+    params.extend(day_params)
 
-    if end_date:
-        query += ' AND calculation_date <= ?'
-        params.append(end_date)
+    if operator_id:
+        query += ' AND operator_id = ?'
+        params.append(operator_id)
 
-    stats = conn.execute(query, params).fetchone()
+    stats = dict(conn.execute(query, params).fetchone())
     conn.close()
 
-    return dict(stats) if stats else {}
+    for key in ('total_amount', 'paid_amount', 'pending_amount'):
+        # Incremental float sums pick up rounding noise; amounts are kopecks.
+        stats[key] = round(stats[key], 2)
+    return stats
+
+
+def _required_day(value):
+    day = to_day(value)
+    if day is None:
+        raise ValueError(f'invalid date: {value}')
+    return day
@@ -0,0 +1,34 @@
+import sqlite3
+
+import rollups
+from schema_manager import DB_PATH, ensure_schema
+
+
+def rebuild(db_path=DB_PATH):
+    """Recompute every rollup table from its source rows in one transaction."""
+    ensure_schema(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for spec in rollups.ROLLUPS:
+                rollups.rebuild_rollup(conn, spec)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {
+            spec["table"]: conn.execute(f"SELECT COUNT(*) FROM {spec['table']}").fetchone()[0]
+            for spec in rollups.ROLLUPS
+        }
+    finally:
+        conn.close()
+
+
+def main():
+    for table, rows in rebuild().items():
+        print(f"Rollups rebuilt: {table} has {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""JSON encoding and compression for API responses.
+
+FastJSONProvider replaces Flask's JSON provider: it encodes with orjson when
+it is installed (the stdlib json module otherwise) and, like Flask's default
+provider, sorts object keys unless app.json.sort_keys is turned off. Views can
+return fetched sqlite3.Row objects as they are; the encoder still turns each
+one into a dict, the speed-up comes from orjson itself. compress_response gzip-
+or brotli-encodes JSON bodies above COMPRESS_MIN_SIZE for clients that accept
+it.
+"""
+import gzip
+import json
+import sqlite3
+from datetime import date, datetime
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = ("application/json",)
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _default(obj):
+    if isinstance(obj, sqlite3.Row):
+        return dict(zip(obj.keys(), obj))
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, sort_keys=True):
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys
+    ).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, self.sort_keys).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.sort_keys), mimetype=self.mimetype)
+
+
+def preferred_encoding(available):
+    """The content coding from `available` (server preference order) the client accepts most, or None."""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """after_request hook: compress large JSON bodies."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = preferred_encoding(available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
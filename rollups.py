@@ -0,0 +1,113 @@
+"""Trigger-maintained aggregate tables.
+
+Each rollup keeps, per (day, operator), sums over the live rows of a source
+table. Triggers on the source apply every insert, update, soft delete, restore
+and hard delete as a delta (-old, +new), so statistics and charts read a
+handful of rollup rows instead of scanning the source. rebuild_rollup
+recomputes a table from scratch to repair drift (see rebuild_rollups.py).
+
+  payment_rollups      live payments: count and amount, split paid / pending
+  calculation_rollups  live calculations: count, sales, kc and salary
+"""
+from day_keys import sql_day
+
+_PAID = "(COALESCE({row}.is_paid, -1) = 1)"
+_PENDING = "(COALESCE({row}.is_paid, -1) = 0)"
+_SALARY = "COALESCE({row}.total_salary, 0)"
+
+PAYMENT_ROLLUP = {
+    "table": "payment_rollups",
+    "source": "payments",
+    "watch": ("operator_id", "calculation_date", "total_salary", "is_paid", "is_deleted"),
+    # (column, type, contribution of one source row)
+    "measures": (
+        ("total_count", "INTEGER", "1"),
+        ("total_amount", "REAL", _SALARY),
+        ("paid_count", "INTEGER", _PAID),
+        ("paid_amount", "REAL", f"CASE WHEN {_PAID} THEN {_SALARY} ELSE 0 END"),
+        ("pending_count", "INTEGER", _PENDING),
+        ("pending_amount", "REAL", f"CASE WHEN {_PENDING} THEN {_SALARY} ELSE 0 END"),
+    ),
+}
+
+CALCULATION_ROLLUP = {
+    "table": "calculation_rollups",
+    "source": "manual_calculations",
+    "watch": ("operator_id", "calculation_date", "sales_amount", "kc_amount", "total_salary", "is_deleted"),
+    "measures": (
+        ("calc_count", "INTEGER", "1"),
+        ("sales_amount", "REAL", "COALESCE({row}.sales_amount, 0)"),
+        ("kc_amount", "REAL", "COALESCE({row}.kc_amount, 0)"),
+        ("salary_amount", "REAL", _SALARY),
+    ),
+}
+
+ROLLUPS = (PAYMENT_ROLLUP, CALCULATION_ROLLUP)
+
+
+def _columns(spec):
+    return [name for name, _, _ in spec["measures"]]
+
+
+def _row_values(spec, row, sign):
+    """SELECT list with the contribution of source row `row` times `sign`."""
+    values = [f"{sql_day(f'{row}.calculation_date')} AS day", f"{row}.operator_id AS operator_id"]
+    values.extend(
+        f"{sign} * ({expression.format(row=row)}) AS {name}" for name, _, expression in spec["measures"]
+    )
+    return ", ".join(values)
+
+
+def _apply_row(spec, row, sign):
+    columns = _columns(spec)
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in columns)
+    return f"""
+        INSERT INTO {spec['table']} (day, operator_id, {', '.join(columns)})
+        SELECT {_row_values(spec, row, sign)} WHERE COALESCE({row}.is_deleted, 0) = 0
+        ON CONFLICT (day, operator_id) DO UPDATE SET {updates};
+    """
+
+
+def create_rollup(conn, spec):
+    table, source = spec["table"], spec["source"]
+    measures = ", ".join(f"{name} {kind} NOT NULL DEFAULT 0" for name, kind, _ in spec["measures"])
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            day INTEGER NOT NULL,
+            operator_id INTEGER NOT NULL,
+            {measures},
+            PRIMARY KEY (day, operator_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_{source}_rollup_insert AFTER INSERT ON {source} "
+        f"BEGIN {_apply_row(spec, 'NEW', 1)} END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_{source}_rollup_delete AFTER DELETE ON {source} "
+        f"BEGIN {_apply_row(spec, 'OLD', -1)} END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_{source}_rollup_update "
+        f"AFTER UPDATE OF {', '.join(spec['watch'])} ON {source} "
+        f"BEGIN {_apply_row(spec, 'OLD', -1)} {_apply_row(spec, 'NEW', 1)} END"
+    )
+
+
+def rebuild_rollup(conn, spec):
+    columns = _columns(spec)
+    conn.execute(f"DELETE FROM {spec['table']}")
+    conn.execute(
+        f"""
+        INSERT INTO {spec['table']} (day, operator_id, {', '.join(columns)})
+        SELECT day, operator_id, {', '.join(f'SUM({column})' for column in columns)}
+        FROM (
+            SELECT {_row_values(spec, 'src', 1)}
+            FROM {spec['source']} src
+            WHERE COALESCE(src.is_deleted, 0) = 0
+        )
+        GROUP BY day, operator_id
+        """
+    )
@@ -22,7 +22,7 @@ echo [%date% %time%] Python ????????? >> system.log
 echo [%date% %time%] ???????? ?????????... >> system.log
 
 echo ????????? ??????????? ?????????...
-pip install flask >nul 2>&1
+pip install -r requirements.txt >nul 2>&1
 echo [%date% %time%] ?????????? ????????? >> system.log
 
 echo.
@@ -37,7 +37,7 @@ echo.
 start http://localhost:5000
 
 echo [%date% %time%] ?????? ??????????... >> system.log
-python app.py
+python serve.py --threads 8
 
 if errorlevel 1 (
     echo [%date% %time%] ?????? ?????????? >> system.log
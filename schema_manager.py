@@ -1,11 +1,16 @@
+import hashlib
+import json
 import sqlite3
-from typing import Iterable, Tuple
+from typing import Callable, Iterable, List, Tuple
+
+import rollups
+from day_keys import sql_day
 
 DB_PATH = 'operators.db'
 
 
-def _get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+def _get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -15,7 +20,7 @@ def _ensure_table(conn: sqlite3.Connection, create_sql: str) -> None:
 
 
 def _ensure_column(conn: sqlite3.Connection, table: str, column: str, ddl: str) -> None:
-    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall()}
     if column not in columns:
         conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
 
@@ -30,9 +35,23 @@ def _ensure_settings(conn: sqlite3.Connection, items: Iterable[Tuple[str, str, s
     )
 
 
-def ensure_schema() -> None:
-    conn = _get_connection()
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = []
+
+
+def migration(version: int, description: str):
+    """Register a schema step; versions must be added in increasing order."""
+
+    def decorator(func: Callable[[sqlite3.Connection], None]):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"migration {version} registered out of order")
+        MIGRATIONS.append((version, description, func))
+        return func
 
+    return decorator
+
+
+@migration(1, "baseline tables and columns")
+def _baseline_schema(conn: sqlite3.Connection) -> None:
     _ensure_table(
         conn,
         """
@@ -197,8 +216,346 @@ def ensure_schema() -> None:
         ],
     )
 
-    conn.commit()
-    conn.close()
+
+@migration(2, "legacy motivation columns and progressive settings")
+def _legacy_motivation_fields(conn: sqlite3.Connection) -> None:
+    # Formerly applied by migrate_motivations_fields.py and update_database.py.
+    for column, ddl in (
+        ("base_salary", "REAL DEFAULT 0"),
+        ("advance_redemption_percent", "REAL DEFAULT 0"),
+        ("final_redemption_percent", "REAL DEFAULT 0"),
+        ("redemption_from", "REAL"),
+        ("redemption_to", "REAL"),
+        ("percent_from_sales", "REAL DEFAULT 0"),
+        ("percent_from_redemption", "REAL DEFAULT 0"),
+        ("bonus_amount", "REAL DEFAULT 0"),
+    ):
+        _ensure_column(conn, "motivations", column, ddl)
+
+    _ensure_settings(
+        conn,
+        [
+            ("progressive_level_2_min", "47", "Минимальный % выкупа для уровня 2"),
+            ("progressive_level_2_max", "52.99", "Максимальный % выкупа для уровня 2"),
+            ("progressive_level_3_min", "53", "Минимальный % выкупа для уровня 3"),
+            ("progressive_level_3_max", "57.99", "Максимальный % выкупа для уровня 3"),
+            ("progressive_level_4_min", "58", "Минимальный % выкупа для уровня 4"),
+            ("default_tax_bonus", "6", "Надбавка на налог по умолчанию"),
+        ],
+    )
+
+
+@migration(3, "indexes from init_db.sql")
+def _base_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_operators_active ON operators (is_active, is_deleted)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calculations_operator ON manual_calculations (operator_id, is_deleted)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_operator ON payments (operator_id, is_deleted)")
+
+
+@migration(4, "content-addressed motivation snapshots")
+def _motivation_versions(conn: sqlite3.Connection) -> None:
+    _ensure_table(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS motivation_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content_hash TEXT UNIQUE NOT NULL,
+            config_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )
+    _ensure_column(conn, "manual_calculations", "motivation_version_id", "INTEGER")
+
+    # Move every existing snapshot into motivation_versions and keep only the id.
+    # The content hash is spelled out as MotivationEngine.canonical_config had
+    # it at this version, so the backfill does not change with that helper.
+    snapshots = conn.execute(
+        "SELECT DISTINCT motivation_snapshot FROM manual_calculations WHERE motivation_snapshot IS NOT NULL"
+    ).fetchall()
+    for (snapshot,) in snapshots:
+        try:
+            config = json.loads(snapshot)
+        except ValueError:
+            continue
+        text = json.dumps(config, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        conn.execute(
+            "INSERT OR IGNORE INTO motivation_versions (content_hash, config_json) VALUES (?, ?)",
+            (content_hash, text),
+        )
+        conn.execute(
+            """
+            UPDATE manual_calculations
+            SET motivation_version_id = (SELECT id FROM motivation_versions WHERE content_hash = ?),
+                motivation_snapshot = NULL
+            WHERE motivation_snapshot = ?
+            """,
+            (content_hash, snapshot),
+        )
+
+
+@migration(5, "indexes for the corrections view")
+def _correction_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calculations_date ON manual_calculations (is_deleted, calculation_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_calculation ON payments (calculation_id, is_deleted)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_payments_operator_date ON payments (operator_id, calculation_date, is_deleted)"
+    )
+
+
+@migration(6, "trigger-maintained live row counts and payment list index")
+def _row_counts(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_date ON payments (is_deleted, calculation_date)")
+    _ensure_table(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS row_counts (
+            table_name TEXT NOT NULL,
+            operator_id INTEGER NOT NULL,
+            live_rows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, operator_id)
+        ) WITHOUT ROWID
+        """,
+    )
+    for table in ("manual_calculations", "payments"):
+        conn.execute("DELETE FROM row_counts WHERE table_name = ?", (table,))
+        conn.execute(
+            f"""
+            INSERT INTO row_counts (table_name, operator_id, live_rows)
+            SELECT '{table}', operator_id, COUNT(*) FROM {table}
+            WHERE COALESCE(is_deleted, 0) = 0
+            GROUP BY operator_id
+            """
+        )
+        increment = f"""
+            INSERT INTO row_counts (table_name, operator_id, live_rows)
+            SELECT '{table}', NEW.operator_id, 1 WHERE COALESCE(NEW.is_deleted, 0) = 0
+            ON CONFLICT (table_name, operator_id) DO UPDATE SET live_rows = live_rows + 1;
+        """
+        decrement = f"""
+            UPDATE row_counts SET live_rows = live_rows - 1
+            WHERE table_name = '{table}' AND operator_id = OLD.operator_id AND COALESCE(OLD.is_deleted, 0) = 0;
+        """
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table} BEGIN {increment} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table} BEGIN {decrement} END")
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_count_update AFTER UPDATE OF is_deleted, operator_id ON {table} "
+            f"BEGIN {decrement} {increment} END"
+        )
+
+
+@migration(7, "partial unique indexes for idempotent payment creation")
+def _unique_payments(conn: sqlite3.Connection) -> None:
+    # Payments created from a calculation are unique per calculation and per
+    # operator + calculation timestamp. Legacy payments (no calculation_id) are
+    # left out: they carry day-only DD.MM.YYYY dates and legitimately repeat.
+    #
+    # Live duplicates would block the indexes. Keep the oldest payment of each
+    # group (the one create_payment used to return) and move the rest to the
+    # trash, where they can still be inspected.
+    for key in ("calculation_id", "operator_id, calculation_date"):
+        conn.execute(
+            f"""
+            UPDATE payments
+            SET is_deleted = 1, deleted_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')
+            WHERE is_deleted = 0 AND id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY id) AS position
+                    FROM payments
+                    WHERE is_deleted = 0 AND calculation_id IS NOT NULL AND calculation_date IS NOT NULL
+                )
+                WHERE position > 1
+            )
+            """
+        )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_payments_calculation ON payments (calculation_id) WHERE is_deleted = 0"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_payments_operator_date "
+        "ON payments (operator_id, calculation_date) WHERE is_deleted = 0 AND calculation_id IS NOT NULL"
+    )
+    # Superseded by uq_payments_calculation; idx_payments_operator_date stays for
+    # matching legacy payments by operator and date.
+    conn.execute("DROP INDEX IF EXISTS idx_payments_calculation")
+
+
+@migration(8, "payment_rollups maintained by triggers")
+def _payment_rollups(conn: sqlite3.Connection) -> None:
+    rollups.create_rollup(conn, rollups.PAYMENT_ROLLUP)
+    rollups.rebuild_rollup(conn, rollups.PAYMENT_ROLLUP)
+
+
+@migration(9, "calculation_rollups maintained by triggers")
+def _calculation_rollups(conn: sqlite3.Connection) -> None:
+    rollups.create_rollup(conn, rollups.CALCULATION_ROLLUP)
+    rollups.rebuild_rollup(conn, rollups.CALCULATION_ROLLUP)
+
+
+@migration(10, "calendar-day columns and indexes on calculations and payments")
+def _calculation_days(conn: sqlite3.Connection) -> None:
+    for table, prefix in (("manual_calculations", "calculations"), ("payments", "payments")):
+        _ensure_column(
+            conn, table, "calculation_day", f"INTEGER GENERATED ALWAYS AS ({sql_day('calculation_date')}) VIRTUAL"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{prefix}_live_day ON {table} (is_deleted, calculation_day)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{prefix}_operator_day ON {table} (operator_id, calculation_day)")
+        # List ordering now uses calculation_day.
+        conn.execute(f"DROP INDEX IF EXISTS idx_{prefix}_date")
+
+
+# The data_versions triggers are rewritten by migrations 12 and 13; each step
+# spells out its own trigger bodies so that replaying it always builds the
+# schema of that version.
+_VERSIONED_TABLES = ("operators", "motivations", "manual_calculations", "payments")
+_VERSION_EVENTS = ("INSERT", "UPDATE", "DELETE")
+_UNIX_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+def _replace_version_triggers(conn: sqlite3.Connection, body: Callable[[str, str], str]) -> None:
+    for table in _VERSIONED_TABLES:
+        for event in _VERSION_EVENTS:
+            name = f"trg_{table}_version_{event.lower()}"
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {body(table, event)} END")
+
+
+@migration(11, "data_versions change counters maintained by triggers")
+def _data_versions(conn: sqlite3.Connection) -> None:
+    _ensure_table(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)",
+        [(table,) for table in _VERSIONED_TABLES],
+    )
+    _replace_version_triggers(
+        conn,
+        lambda table, event: f"UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';",
+    )
+
+
+@migration(12, "modification times in data_versions")
+def _data_version_times(conn: sqlite3.Connection) -> None:
+    _ensure_column(conn, "data_versions", "updated_at", "REAL")
+    conn.execute(f"UPDATE data_versions SET updated_at = {_UNIX_NOW}")
+    _replace_version_triggers(
+        conn,
+        lambda table, event: (
+            f"UPDATE data_versions SET version = version + 1, updated_at = {_UNIX_NOW} WHERE table_name = '{table}';"
+        ),
+    )
+
+
+@migration(13, "change_events log written by the data_versions triggers")
+def _change_events(conn: sqlite3.Connection) -> None:
+    # AUTOINCREMENT: ids are never reused after old events are pruned, so an
+    # SSE client's Last-Event-ID stays meaningful.
+    _ensure_table(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS change_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """,
+    )
+    # Entity names as the trash API uses them; operations distinguish soft
+    # deletes and restores from other updates.
+    entities = {
+        "operators": "operator",
+        "motivations": "motivation",
+        "manual_calculations": "calculation",
+        "payments": "payment",
+    }
+    operations = {
+        "INSERT": "'insert'",
+        "UPDATE": (
+            "CASE WHEN COALESCE(OLD.is_deleted, 0) = 0 AND NEW.is_deleted = 1 THEN 'delete' "
+            "WHEN OLD.is_deleted = 1 AND COALESCE(NEW.is_deleted, 0) = 0 THEN 'restore' ELSE 'update' END"
+        ),
+        "DELETE": "'purge'",
+    }
+    _replace_version_triggers(
+        conn,
+        lambda table, event: f"""
+            UPDATE data_versions SET version = version + 1, updated_at = {_UNIX_NOW} WHERE table_name = '{table}';
+            INSERT INTO change_events (entity, entity_id, operation, version, created_at)
+            SELECT '{entities[table]}', {"OLD" if event == "DELETE" else "NEW"}.id, {operations[event]}, version,
+                {_UNIX_NOW}
+            FROM data_versions WHERE table_name = '{table}';
+        """,
+    )
+
+
+@migration(14, "change_events pruned on insert")
+def _change_events_prune(conn: sqlite3.Connection) -> None:
+    # Keep the last 10000 events. Pruning used to happen in the SSE poller,
+    # which only runs while a browser has a stream open.
+    conn.execute("DELETE FROM change_events WHERE id <= (SELECT MAX(id) FROM change_events) - 10000")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_change_events_prune AFTER INSERT ON change_events "
+        "BEGIN DELETE FROM change_events WHERE id <= NEW.id - 10000; END"
+    )
+
+
+@migration(15, "payments unique per calculation only")
+def _payments_unique_per_calculation(conn: sqlite3.Connection) -> None:
+    # calculation_date has one-second resolution, so two calculations for one
+    # operator in the same second collided on this index and the second one
+    # silently got no payment. uq_payments_calculation alone keeps creation
+    # idempotent.
+    conn.execute("DROP INDEX IF EXISTS uq_payments_operator_date")
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def ensure_schema(db_path: str = DB_PATH) -> int:
+    """Apply pending migrations to db_path in one transaction; returns the schema version.
+
+    The version lives in PRAGMA user_version, so an up-to-date database costs a
+    single PRAGMA read and nothing else.
+    """
+    conn = _get_connection(db_path)
+    conn.isolation_level = None
+    try:
+        target = latest_version()
+        current = schema_version(conn)
+        if current >= target:
+            return current
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock.
+            current = schema_version(conn)
+            for version, _description, apply in MIGRATIONS:
+                if version > current:
+                    apply(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return target
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
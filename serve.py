@@ -0,0 +1,138 @@
+"""Production server: the app on waitress, optionally in several worker processes.
+
+    pip install -r requirements.txt
+    python serve.py --workers 4 --threads 8 --port 5000
+
+Each worker is a waitress server with --threads request threads. With more
+than one worker, the parent binds the socket, warms the caches once and forks
+the workers, which accept on the shared socket; fork is not available on
+Windows, where a single worker is used. `python app.py` still starts the
+Flask debug server for development.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import traceback
+
+from waitress.server import create_server
+
+import events
+import pagination
+import static_assets
+from app import app
+from config import close_all_connections, get_db_connection, release_db_connection, shutdown_action_log
+from motivation_engine import MotivationEngine
+
+
+def warm_caches():
+    """Fill per-process caches before the first request instead of during it."""
+    static_assets.build()
+    conn = get_db_connection()
+    try:
+        for table in ("manual_calculations", "payments"):
+            pagination.table_columns(conn, table)
+        for row in conn.execute("SELECT id, config_json FROM motivations WHERE is_deleted = 0").fetchall():
+            try:
+                MotivationEngine.get_plan(row["id"], row["config_json"])
+            except (TypeError, ValueError):
+                pass  # reported when the motivation is used
+    finally:
+        conn.close()
+        release_db_connection()
+
+
+def _raise_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def run_worker(sock, threads):
+    """Serve on `sock` until SIGTERM/SIGINT, then drain requests and flush the audit log."""
+    signal.signal(signal.SIGTERM, _raise_exit)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    # Event streams hold a request thread each; keep the rest for normal requests.
+    events.hub.limit_streams(threads)
+    server = create_server(app, sockets=[sock], threads=threads)
+    try:
+        server.run()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()  # waits for in-flight requests
+        events.hub.stop()
+        shutdown_action_log()
+        close_all_connections()
+
+
+def _spawn(sock, threads):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, threads)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        os._exit(code)
+    return pid
+
+
+def run_workers(sock, workers, threads):
+    # SQLite connections must not cross fork(); the children open their own.
+    close_all_connections()
+    children = {_spawn(sock, threads) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"worker {pid} exited with status {status}; restarting", file=sys.stderr)
+            children.add(_spawn(sock, threads))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the salary app with waitress")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (needs fork)")
+    parser.add_argument("--threads", type=int, default=8, help="request threads per worker")
+    args = parser.parse_args(argv)
+
+    workers = max(args.workers, 1)
+    if workers > 1 and not hasattr(os, "fork"):
+        print("--workers needs fork(); starting a single worker", file=sys.stderr)
+        workers = 1
+
+    warm_caches()
+    sock = socket.create_server((args.host, args.port))
+    print(f"Serving on http://{args.host}:{args.port} ({workers} worker(s) x {args.threads} threads)")
+    try:
+        if workers == 1:
+            run_worker(sock, args.threads)
+        else:
+            run_workers(sock, workers, args.threads)
+    finally:
+        sock.close()
+        shutdown_action_log()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Opt-in slow-query log for statements run through the connection pool.
+
+When a threshold is set (SLOW_QUERY_MS in the environment, or at runtime via
+PUT /api/admin/slow-queries), every statement whose execute + fetch time
+reaches it is kept in a bounded ring buffer together with:
+
+  - the SQL text and the shape of its parameters (types only, never values),
+  - its EXPLAIN QUERY PLAN, run on the same connection with the same
+    parameters, so the variant that actually ran is the one explained,
+  - the call site (innermost frames outside the connection code) and the request.
+
+GET /api/admin/slow-queries shows the buffer; POST .../dump downloads it as a
+JSON file (nothing is written on the server). Both, like the PUT, are
+restricted to loopback or ADMIN_TOKEN (see app.admin_only). Disabled, the
+cost is one attribute check per statement.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+
+from flask import has_request_context, request
+
+CAPACITY = 200
+CALL_SITE_DEPTH = 3
+DUMP_PREFIX = "slow_queries"
+
+# Seconds; None disables the log.
+threshold = float(os.environ["SLOW_QUERY_MS"]) / 1000.0 if os.environ.get("SLOW_QUERY_MS") else None
+
+_entries = deque(maxlen=CAPACITY)
+_lock = threading.Lock()
+_INTERNAL_FILES = (os.path.abspath(__file__), os.path.abspath(os.path.join(os.path.dirname(__file__), "config.py")))
+
+
+def set_threshold(milliseconds):
+    global threshold
+    threshold = None if milliseconds is None else float(milliseconds) / 1000.0
+
+
+def _shape(parameters):
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    try:
+        return [type(value).__name__ for value in parameters]
+    except TypeError:
+        return type(parameters).__name__
+
+
+def _call_site():
+    """Innermost CALL_SITE_DEPTH frames outside the connection code, innermost first."""
+    frames = []
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if os.path.abspath(frame.filename) in _INTERNAL_FILES:
+            continue
+        frames.append(f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}")
+        if len(frames) == CALL_SITE_DEPTH:
+            break
+    return frames
+
+
+def _plan(conn, sql, parameters):
+    try:
+        # sqlite3.Connection.execute directly, so the EXPLAIN is neither counted nor logged itself.
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    return [row[3] for row in rows]
+
+
+def record(conn, sql, parameters, seconds, many=False):
+    """Add a statement that reached the threshold to the ring buffer."""
+    entry = {
+        "at": datetime.now().isoformat(timespec="milliseconds"),
+        "duration_ms": round(seconds * 1000.0, 3),
+        "sql": " ".join(sql.split()),
+        "parameters": "executemany" if many else _shape(parameters),
+        "plan": None if many else _plan(conn, sql, parameters),
+        "call_site": _call_site(),
+        "request": f"{request.method} {request.path}" if has_request_context() else None,
+    }
+    with _lock:
+        _entries.append(entry)
+
+
+def entries():
+    with _lock:
+        return list(_entries)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def dump():
+    """The buffer as JSON text; returns (timestamped file name, text)."""
+    filename = f"{DUMP_PREFIX}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    return filename, json.dumps(entries(), ensure_ascii=False, indent=2)
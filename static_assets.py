@@ -0,0 +1,123 @@
+"""Fingerprinted, precompressed front-end assets.
+
+build() copies each file in ASSETS to STATIC_DIR under a content-hashed name
+(app.3f2a9c1b0d4e.js) next to .gz and, with brotli installed, .br variants,
+and rewrites index.html to point at the hashed names. The app serves only
+these files: assets with immutable cache headers, index.html with an ETag so
+a repeat visit costs one small revalidation.
+
+Run `python static_assets.py` to build without starting the server.
+"""
+import gzip
+import hashlib
+import os
+import re
+
+from flask import abort, current_app, request
+
+from responses import brotli, preferred_encoding
+
+ASSETS = ("app.js", "debug.js", "visual-debug.js", "styles.css")
+INDEX = "index.html"
+STATIC_DIR = "static"
+STATIC_URL = "/static/"
+
+MIMETYPES = {".js": "text/javascript", ".css": "text/css", ".html": "text/html"}
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_assets = {}
+_index = None
+
+
+def _variants(body):
+    variants = {None: body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+def _write(path, data):
+    # Written to a temporary name and renamed, so concurrent workers never see partial files.
+    if os.path.exists(path):
+        return
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _entry(body, mimetype):
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    return {"etag": digest, "mimetype": mimetype, "variants": _variants(body)}
+
+
+def build(root=".", out_dir=None):
+    """Fingerprint and precompress ASSETS, rewrite index.html; returns {source name: hashed name}."""
+    global _assets, _index
+    out_dir = out_dir or os.path.join(root, STATIC_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    assets, manifest = {}, {}
+    for name in ASSETS:
+        with open(os.path.join(root, name), "rb") as f:
+            body = f.read()
+        stem, ext = os.path.splitext(name)
+        entry = _entry(body, MIMETYPES[ext])
+        hashed = f"{stem}.{entry['etag']}{ext}"
+        for encoding, data in entry["variants"].items():
+            suffix = {None: "", "gzip": ".gz", "br": ".br"}[encoding]
+            _write(os.path.join(out_dir, hashed + suffix), data)
+        assets[hashed] = entry
+        manifest[name] = hashed
+
+    # Drop outputs of earlier builds.
+    keep = {hashed + suffix for hashed in assets for suffix in ("", ".gz", ".br")}
+    for existing in os.listdir(out_dir):
+        if existing not in keep and not existing.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, existing))
+
+    with open(os.path.join(root, INDEX), "rb") as f:
+        html = f.read().decode("utf-8")
+    names = "|".join(re.escape(name) for name in ASSETS)
+    html = re.sub(
+        rf'(\s(?:src|href)=")(?:\./)?({names})"',
+        lambda match: f'{match.group(1)}{STATIC_URL}{manifest[match.group(2)]}"',
+        html,
+    )
+    _assets = assets
+    _index = _entry(html.encode("utf-8"), MIMETYPES[".html"])
+    return manifest
+
+
+def _respond(entry, cache_control):
+    if request.if_none_match.contains_weak(entry["etag"]):
+        response = current_app.response_class(status=304)
+    else:
+        encoding = preferred_encoding([name for name in ("br", "gzip") if name in entry["variants"]])
+        response = current_app.response_class(entry["variants"][encoding], mimetype=entry["mimetype"])
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(entry["etag"], weak=True)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def index_response():
+    if _index is None:
+        build()
+    return _respond(_index, "no-cache")
+
+
+def asset_response(name):
+    if _index is None:
+        build()
+    entry = _assets.get(name)
+    if entry is None:
+        abort(404)
+    return _respond(entry, ASSET_CACHE_CONTROL)
+
+
+if __name__ == "__main__":
+    for source, hashed in build().items():
+        print(f"{source} -> {STATIC_DIR}/{hashed}")